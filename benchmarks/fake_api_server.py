@@ -0,0 +1,145 @@
+####################################
+# Notes: Local stand-in for the Datamine and EIA v2
+# endpoints so pipelines can be timed offline.
+#   /cme/api/v1/download?fid=<yyyymmdd>-<fid> (honours Range)
+#   /cme/api/v1/batchdownload?dataset=eod&yyyymmdd=...
+#   /v2/petroleum/pnp/wiup/data/?...&offset=&length=
+# latency (seconds) is added to every response;
+# error_rate is the share of calls answered with a
+# random 429/5xx (the clients' retry codes), with
+# Retry-After on the 429s when retry_after is set.
+####################################
+
+import io, gzip, json, time, random, zipfile
+import datetime
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from benchmarks.synthetic_reports import generate_report
+
+ERROR_CODES = [429, 500, 502, 503, 504]
+EIA_FACETS = {"YUP":90.0, "YRL":18000.0, "EPXXX2":16000.0}
+EIA_AREAS = [("NUS", "U.S."), ("R10", "PADD 1"), ("R20", "PADD 2"), ("R30", "PADD 3"), ("R40", "PADD 4"), ("R50", "PADD 5")]
+
+
+def generate_eia_rows(facet, n_weeks, end_date=None):
+    ''' Weekly rows, most recent period first, shaped like pnp/wiup/data. '''
+    end_date = end_date or datetime.date.today()
+    friday = end_date - datetime.timedelta(days=(end_date.weekday() - 4) % 7)
+    rng = random.Random(facet)
+    rows = []
+    for week in range(n_weeks):
+        period = (friday - datetime.timedelta(weeks=week)).isoformat()
+        for duoarea, area_name in EIA_AREAS:
+            rows.append({"period":period, "duoarea":duoarea, "area-name":area_name,
+                         "product":facet if facet == "EPXXX2" else "EPXXX", "product-name":"Synthetic",
+                         "process":facet if facet != "EPXXX2" else "YIY", "process-name":"Synthetic",
+                         "series":f"W_{duoarea}_{facet}", "series-description":f"{area_name} {facet} (synthetic)",
+                         "value":str(round(EIA_FACETS[facet]*rng.uniform(0.9, 1.0), 1)), "units":"MBBL/D"})
+    return rows
+
+
+class FakeAPIServer:
+    '''
+        with FakeAPIServer(latency=0.05) as server:
+            api.base_endpoint = server.url + "/cme/api/v1/download"
+    '''
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0,
+                 report_kwargs=None, batch_fids=(), eia_weeks=520, seed=0, retry_after=None):
+        self.latency = latency
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.report_kwargs = report_kwargs or {}
+        self.batch_fids = list(batch_fids)
+        self.eia_rows = {facet:generate_eia_rows(facet, eia_weeks) for facet in EIA_FACETS}
+        self.stats = {"requests":0, "errors_injected":0, "bytes_sent":0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._reports = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _get_report(self, fid_endpoint):
+        with self._lock:
+            if fid_endpoint not in self._reports:
+                self._reports[fid_endpoint] = generate_report(**self.report_kwargs).encode()
+            return self._reports[fid_endpoint]
+
+    def _get_batch(self, yyyymmdd):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as zf:
+            for fid in self.batch_fids:
+                zf.writestr(f"{yyyymmdd}-{fid}.txt.gz", gzip.compress(self._get_report(f"{yyyymmdd}-{fid}")))
+        return buffer.getvalue()
+
+    def _get_eia_page(self, query):
+        facet = next(v[0] for k, v in query.items() if k.startswith("facets["))
+        rows = self.eia_rows.get(facet, [])
+        if "start" in query: rows = [r for r in rows if r["period"] >= query["start"][0]]
+        offset = int(query.get("offset", ["0"])[0]); length = int(query.get("length", ["5000"])[0])
+        body = {"response":{"total":str(len(rows)), "data":rows[offset:offset + length]}}
+        return json.dumps(body).encode()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass # quiet; stats are counted instead.
+
+            def _send(self, status, body=b"", content_type="application/octet-stream"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                if status == 429 and server.retry_after is not None: self.send_header("Retry-After", str(server.retry_after))
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                with server._lock: server.stats["bytes_sent"] += len(body)
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with server._lock:
+                    server.stats["requests"] += 1
+                    inject = server._rng.random() < server.error_rate
+                    if inject: server.stats["errors_injected"] += 1
+                if server.latency: time.sleep(server.latency)
+                if inject: return self._send(server._rng.choice(ERROR_CODES))
+
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                if parsed.path.endswith("/cme/api/v1/download") and "fid" in query:
+                    report = server._get_report(query["fid"][0])
+                    byte_range = self.headers.get("Range", "")
+                    if byte_range.startswith("bytes="):
+                        first, _, last = byte_range[len("bytes="):].partition("-")
+                        return self._send(206, report[int(first):int(last) + 1 if last else None], "text/plain")
+                    return self._send(200, report, "text/plain")
+                if parsed.path.endswith("/cme/api/v1/batchdownload") and "yyyymmdd" in query:
+                    return self._send(200, server._get_batch(query["yyyymmdd"][0]), "application/zip")
+                if parsed.path.rstrip("/").endswith("/v2/petroleum/pnp/wiup/data"):
+                    return self._send(200, server._get_eia_page(query), "application/json")
+                return self._send(404)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
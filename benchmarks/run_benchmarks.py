@@ -0,0 +1,119 @@
+####################################
+# Notes: Offline benchmarks, no credentials needed.
+#   parse: fixed-width slicer vs the token fallback
+#          on a synthetic report (rows/s, MB/s).
+#   cme:   CMEDatamineAPI per-fid and eod batch pulls
+#          against the local fake server.
+#   eia:   eiaapi.get_data(full_history=True) against
+#          the same server.
+# Run from the repo root:
+#   python -m benchmarks.run_benchmarks --rows 500 --latency 0.05 --error-rate 0.1
+####################################
+
+import os, json, time, tempfile, argparse
+import statistics
+from unittest import mock
+
+from benchmarks.synthetic_reports import write_report
+from benchmarks.fake_api_server import FakeAPIServer
+
+# Dummy credentials; the fake server ignores them.
+for _name in ("CME_API_ID", "CME_API_PW", "EIA_API_KEY"):
+    os.environ.setdefault(_name, "benchmark")
+
+from cme.src import pull_cme_data
+from cme.src.pull_cme_data import CMEDatamineAPI, _scan_report_sections, _sections_to_dfs, _section_lines_to_rows
+from eia.src.pull_eia_data import eiaapi
+
+BENCH_FID_DICT = pull_cme_data.FID_DICT
+
+
+def _time_runs(func, repeat):
+    ''' Median and min wall time of repeat calls, plus the last result. '''
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - t0)
+    return {"median_s":statistics.median(timings), "min_s":min(timings)}, result
+
+def bench_parse(report_path, repeat):
+    data_sets = [d for data_sets in BENCH_FID_DICT.values() for d in data_sets]
+    n_bytes = os.path.getsize(report_path)
+
+    def _parse():
+        section_lines = _scan_report_sections(report_path, data_sets, search_footer_str="TOTAL")
+        return _sections_to_dfs(section_lines, data_sets)
+
+    results = {}
+    for path_name, patch in (("fixed_width", None), ("token_fallback", mock.patch.object(pull_cme_data, "_slice_fixed_width", return_value=None))):
+        if patch: patch.start()
+        try:
+            timing, dfs = _time_runs(_parse, repeat)
+        finally:
+            if patch: patch.stop()
+        n_rows = sum(len(df) for df in dfs.values())
+        results[path_name] = dict(timing, rows=n_rows,
+                                  rows_per_s=n_rows/timing["median_s"], mb_per_s=n_bytes/1e6/timing["median_s"])
+
+    # Plain rows for the CLI's record path (no pandas).
+    def _parse_rows():
+        section_lines = _scan_report_sections(report_path, data_sets, search_footer_str="TOTAL")
+        return {d:_section_lines_to_rows(d, section_lines[d]) for d in data_sets}
+    timing, rows = _time_runs(_parse_rows, repeat)
+    n_rows = sum(len(r) for r in rows.values())
+    results["records"] = dict(timing, rows=n_rows, rows_per_s=n_rows/timing["median_s"], mb_per_s=n_bytes/1e6/timing["median_s"])
+    return results
+
+def bench_cme(server_url, repeat, workers):
+    cme = CMEDatamineAPI()
+    cme.base_endpoint = f"{server_url}/cme/api/v1/download"
+    cme.batch_endpoint = f"{server_url}/cme/api/v1/batchdownload"
+    per_fid, _ = _time_runs(lambda: cme.get_dfs_from_fid_dict(BENCH_FID_DICT, max_workers=workers), repeat)
+    batch, _ = _time_runs(lambda: cme.get_dfs_from_eod_batch(BENCH_FID_DICT), repeat)
+    return {"per_fid":per_fid, "eod_batch":batch, "metrics":cme.metrics.snapshot()}
+
+def bench_eia(server_url, repeat):
+    eia = eiaapi()
+    eia.base_url = f"{server_url}/v2/petroleum/"
+    timing, df = _time_runs(lambda: eia.get_data(full_history=True, all_periods=True), repeat)
+    return dict(timing, rows=len(df), metrics=eia.metrics.snapshot())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks against synthetic Datamine/EIA data.")
+    parser.add_argument("--rows", type=int, default=60, help="Rows per report section.")
+    parser.add_argument("--sections", type=int, default=200, help="Filler sections per report (file size).")
+    parser.add_argument("--short-row-share", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to each fake API response.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake API calls answered 429/5xx.")
+    parser.add_argument("--eia-weeks", type=int, default=520)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", choices=["parse", "cme", "eia"], action="append", help="Run a subset (repeatable).")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args(argv)
+    only = set(args.only or ["parse", "cme", "eia"])
+
+    report_kwargs = {"rows_per_section":args.rows, "n_filler_sections":args.sections,
+                     "short_row_share":args.short_row_share}
+    results = {"config":vars(args)}
+    if "parse" in only:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report_path = write_report(os.path.join(tmp_dir, "synthetic_report.txt"), **report_kwargs)
+            results["parse"] = dict(bench_parse(report_path, args.repeat), bytes=os.path.getsize(report_path))
+    if only & {"cme", "eia"}:
+        with FakeAPIServer(latency=args.latency, error_rate=args.error_rate, report_kwargs=report_kwargs,
+                           batch_fids=BENCH_FID_DICT, eia_weeks=args.eia_weeks) as server:
+            if "cme" in only: results["cme"] = bench_cme(server.url, args.repeat, args.workers)
+            if "eia" in only: results["eia"] = bench_eia(server.url, args.repeat)
+            results["server"] = dict(server.stats)
+
+    if args.json:
+        print(json.dumps(results, indent=1, default=str))
+    else:
+        for name, value in results.items():
+            print(f"{name}: {json.dumps(value, default=str)}")
+    return results
+
+if __name__ == "__main__":
+    main()
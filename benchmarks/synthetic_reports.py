@@ -0,0 +1,75 @@
+####################################
+# Notes: Synthetic Datamine settlement reports for
+# offline benchmarks. Same layout as the STLBASIC
+# files: fixed-width, right-aligned numbers, one
+# section per product ended by a TOTAL line. Short
+# rows follow the null-column handler patterns
+# (10/9/8 fields) so the fallback path is exercised.
+####################################
+
+import random
+import datetime
+
+from cme.src import products
+
+WIDTHS = [9, 10, 10, 10, 11, 11, 8, 11, 11, 11, 12]
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+# Blank columns per short-row pattern (see products.NULL_COLUMN_HANDLERS).
+SHORT_ROW_BLANKS = {10:[8], 9:[7, 9], 8:[7, 9, 10]}
+
+
+def _format_row(fields):
+    return "".join(f.ljust(w) if i == 0 else f.rjust(w) for i, (f, w) in enumerate(zip(fields, WIDTHS)))
+
+def _format_price(value, rng):
+    text = f"{value:.4f}".rstrip("0").rstrip(".")
+    if text.startswith("0."): text = text[1:]                   # CME prints .8044
+    return text + (rng.choice(["A", "B"]) if rng.random() < 0.05 else "")
+
+def _section_rows(n_rows, start_year, rng, short_row_share):
+    price = rng.uniform(0.2, 100.0)
+    for i in range(n_rows):
+        month = f"{MONTHS[i % 12]}{(start_year + i//12) % 100:02d}"
+        price *= rng.uniform(0.995, 1.005)
+        sett = _format_price(price, rng)
+        change = rng.uniform(-0.5, 0.5)
+        fields = [month,
+                  _format_price(price*1.01, rng), _format_price(price*1.02, rng), _format_price(price*0.98, rng),
+                  _format_price(price, rng), sett,
+                  "UNCH" if abs(change) < 0.01 else f"{change:+.2f}".replace("0.", "."),
+                  str(rng.randint(0, 200000)), sett, str(rng.randint(0, 200000)), str(rng.randint(0, 500000))]
+        if rng.random() < short_row_share:
+            for i_col in SHORT_ROW_BLANKS[rng.choice(list(SHORT_ROW_BLANKS))]:
+                fields[i_col] = ""
+        yield _format_row(fields)
+
+def generate_report(data_sets=None, rows_per_section=60, n_filler_sections=0, short_row_share=0.3,
+                    trade_date=None, seed=0):
+    '''
+        Returns the report text. data_sets defaults
+        to every registered product; filler sections
+        (products nobody requests) pad the file the
+        way the real exchange-wide reports do.
+    '''
+    rng = random.Random(seed)
+    trade_date = trade_date or datetime.date.today()
+    data_sets = list(data_sets or products.PRODUCTS)
+    sections = data_sets + [f"Z{n:03d} Synthetic Filler Futures" for n in range(n_filler_sections)]
+    rng.shuffle(sections)
+
+    lines = [f"CME GROUP SYNTHETIC SETTLEMENT REPORT  TRADE DATE {trade_date:%m/%d/%Y}", ""]
+    header = _format_row(["MTH/", "", "", "", "", "", "PT", "EST.", "PRIOR", "PRIOR", "PRIOR"])
+    subheader = _format_row(["STRIKE", "OPEN", "HIGH", "LOW", "LAST", "SETT", "CHGE", "VOL", "SETT", "VOL", "INT"])
+    for section in sections:
+        lines.extend([header, subheader, section])
+        lines.extend(_section_rows(rows_per_section, trade_date.year, rng, short_row_share))
+        lines.append(f"TOTAL{str(rng.randint(0, 10**6)).rjust(60)}")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+def write_report(path, **kwargs):
+    text = generate_report(**kwargs)
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
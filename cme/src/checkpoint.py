@@ -0,0 +1,67 @@
+####################################
+# Notes: Progress file for long backfills.
+# Completed trade dates (yyyymmdd) are kept in
+# checkpoint.json; a rerun skips them. The file is
+# rewritten atomically after every date so an
+# interrupted run loses at most the dates in flight.
+# A date whose output file is gone counts as not
+# done, and a corrupt file as an empty one.
+####################################
+
+import os
+import threading
+
+from common.src.json_state import load_json, save_json
+
+
+class BackfillCheckpoint:
+
+    def __init__(self, checkpoint_path):
+        self.checkpoint_path = checkpoint_path
+        self._lock = threading.Lock()
+        checkpoint_dir = os.path.dirname(checkpoint_path) or "."
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self._state = self._load()
+
+    @staticmethod
+    def get_key(trade_date):
+        ''' trade_date is a date or a yyyymmdd string. '''
+        if not isinstance(trade_date, str): trade_date = trade_date.strftime("%Y%m%d")
+        return trade_date
+
+    def _load(self):
+        state = load_json(self.checkpoint_path, {}) # corrupt; every date is pulled again.
+        state.setdefault("completed", {}); state.setdefault("failed", {})
+        return state
+
+    def _save(self):
+        save_json(self.checkpoint_path, self._state, indent=1, sort_keys=True)
+
+    def is_completed(self, trade_date):
+        ''' Recorded and its output still on disk. '''
+        with self._lock:
+            output_path = self._state["completed"].get(self.get_key(trade_date))
+        return output_path is not None and os.path.exists(output_path)
+
+    def mark_completed(self, trade_date, output_path):
+        key = self.get_key(trade_date)
+        with self._lock:
+            self._state["completed"][key] = output_path
+            self._state["failed"].pop(key, None)
+            self._save()
+
+    def mark_failed(self, trade_date, error):
+        ''' Failed dates are not skipped; they are retried on the next run. '''
+        with self._lock:
+            self._state["failed"][self.get_key(trade_date)] = str(error)
+            self._save()
+
+    def completed_outputs(self):
+        ''' {yyyymmdd: output_path} of the outputs still on disk, sorted by date. '''
+        with self._lock:
+            completed = sorted(self._state["completed"].items())
+        return {key:path for key, path in completed if os.path.exists(path)}
+
+    def failed(self):
+        with self._lock:
+            return dict(self._state["failed"])
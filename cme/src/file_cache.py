@@ -0,0 +1,154 @@
+####################################
+# Notes: Local cache of Datamine files.
+# Files are stored by sha256 (objects/<sha256>)
+# and indexed by "<yyyymmdd>-<fid>" in index.json.
+# Checksums are verified on every hit (get); bad or
+# missing blobs are dropped and re-downloaded.
+# contains() only checks the index, for probes.
+####################################
+
+import os, time, hashlib, tempfile
+import threading
+
+from cme.src.section_index import get_index_path
+from common.src.json_state import load_json, save_json
+
+CHUNK_SIZE = 1024*1024
+
+
+class DatamineFileCache:
+
+    def __init__(self, cache_dir, max_bytes=2*1024**3, max_age_days=30):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days*24*60*60 if max_age_days is not None else None
+        self._lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    @staticmethod
+    def get_key(fid_date, fid):
+        ''' fid_date is a date or a yyyymmdd string. '''
+        if not isinstance(fid_date, str): fid_date = fid_date.strftime("%Y%m%d")
+        return f"{fid_date}-{fid.replace(' ', '')}"
+
+    def _load_index(self):
+        return load_json(self.index_path, {}) # corrupt index; blobs are re-verified on use.
+
+    def _save_index(self):
+        save_json(self.index_path, self._index)
+
+    def _object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256)
+
+    @staticmethod
+    def _file_sha256(path):
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _drop(self, key):
+        ''' Remove key; the blob goes too when no other key points at it. '''
+        entry = self._index.pop(key, None)
+        if entry is None: return
+        if not any(e["sha256"] == entry["sha256"] for e in self._index.values()):
+            path = self._object_path(entry["sha256"])
+            for drop_path in (path, get_index_path(path)): # blob and its section index
+                try: os.remove(drop_path)
+                except FileNotFoundError: pass
+
+    def contains(self, fid_date, fid):
+        '''
+            Indexed, unexpired and on disk, without
+            the checksum (probes); get() verifies.
+        '''
+        key = self.get_key(fid_date, fid)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None: return False
+            if self.max_age_seconds is not None and time.time() - entry["stored_at"] > self.max_age_seconds: return False
+            return os.path.exists(self._object_path(entry["sha256"]))
+
+    def get(self, fid_date, fid):
+        '''
+            Path of the cached file, or None on a
+            miss/failed checksum. The blob is hashed
+            outside the lock, so concurrent hits on
+            different fids do not queue behind it.
+        '''
+        key = self.get_key(fid_date, fid)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None: return None
+            sha256 = entry["sha256"]
+            path = self._object_path(sha256)
+            expired = self.max_age_seconds is not None and time.time() - entry["stored_at"] > self.max_age_seconds
+
+        try: valid = not expired and self._file_sha256(path) == sha256
+        except OSError: valid = False # missing, or evicted by another worker.
+
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or entry["sha256"] != sha256: return None # dropped or replaced meanwhile.
+            if not valid:
+                self._drop(key)
+                self._save_index()
+                return None
+            entry["last_access"] = time.time()
+            self._save_index()
+            return path
+
+    def put_stream(self, fid_date, fid, chunks):
+        '''
+            Streams chunks to disk while hashing,
+            then moves the file into objects/.
+            Returns the cached path.
+        '''
+        key = self.get_key(fid_date, fid)
+        h = hashlib.sha256(); size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    if not chunk: continue
+                    f.write(chunk); h.update(chunk); size += len(chunk)
+            sha256 = h.hexdigest()
+            path = self._object_path(sha256)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            now = time.time()
+            self._index[key] = {"sha256":sha256, "size":size, "stored_at":now, "last_access":now}
+            self._evict(keep_key=key)
+            self._save_index()
+        return path
+
+    def _evict(self, keep_key=None):
+        ''' Age first, then least recently used until under max_bytes. '''
+        now = time.time()
+        if self.max_age_seconds is not None:
+            for key in [k for k, e in self._index.items() if now - e["stored_at"] > self.max_age_seconds and k != keep_key]:
+                self._drop(key)
+
+        if self.max_bytes is not None:
+            sizes = {e["sha256"]:e["size"] for e in self._index.values()}
+            total = sum(sizes.values())
+            for key in sorted(self._index, key=lambda k: self._index[k]["last_access"]):
+                if total <= self.max_bytes: break
+                if key == keep_key: continue
+                sha256 = self._index[key]["sha256"]
+                self._drop(key)
+                if sha256 not in {e["sha256"] for e in self._index.values()}:
+                    total -= sizes[sha256]
+
+    def evict(self):
+        with self._lock:
+            self._evict()
+            self._save_index()
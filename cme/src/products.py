@@ -0,0 +1,147 @@
+####################################
+# Notes: Product registry shared by pull_cme_data
+# and the Synapse notebook. One entry per report
+# section; adding a product is one line here.
+#   short_name: output column name.
+#   sql_column: Synapse column name.
+#   price_field: SETT (settlement) or DAILY_LAST (last).
+#   transform: name in TRANSFORMS, or None.
+#   null_column_handlers (optional): token-parser
+#   fallback table, defaults to NULL_COLUMN_HANDLERS.
+####################################
+
+import datetime
+
+from common.src.lazy_import import lazy_import
+
+# Imported on first use; the *_records helpers are plain Python.
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+PRODUCTS = {
+    "26 Crude Oil Last Day Financial Futures":          {"short_name":"WTI Crude Oil",   "sql_column":"wti_crude_oil",   "price_field":"SETT",       "transform":None},
+    "B0 Mont Belvieu LDH Propane (OPIS) Futures":       {"short_name":"Propane",         "sql_column":"propane",         "price_field":"SETT",       "transform":None},
+    "BZ Brent Crude Oil Last Day Financial Futures":    {"short_name":"Brent Crude Oil", "sql_column":"brent_crude_oil", "price_field":"SETT",       "transform":None},
+    "C0 Mont Belvieu Ethane (OPIS) Futures":            {"short_name":"Ethane",          "sql_column":"ethane",          "price_field":"SETT",       "transform":None},
+    "C1 Canadian Dollar/U.S. Dollar (CAD/USD) Futures": {"short_name":"US to CA$",       "sql_column":"usd2cad",         "price_field":"DAILY_LAST", "transform":"inverse"},
+    "EC Euro/U.S. Dollar (EUR/USD) Futures":            {"short_name":"Euro to $US",     "sql_column":"euro2usd",        "price_field":"DAILY_LAST", "transform":None},
+    "NG Henry Hub Natural Gas Futures":                 {"short_name":"Nat. Gas",        "sql_column":"nat_gas",         "price_field":"SETT",       "transform":None},
+}
+
+# Fallback token parser: {n fields present: [(after field i, k blanks), ...]}.
+NULL_COLUMN_HANDLERS = {10:[(7,1)], 9:[(6, 1), (7, 1)], 8:[(6, 1), (7, 2)]}
+
+# Report column -> column name after the upsert rename.
+PRICE_FIELD_COLUMNS = {"SETT":"Settlement_Price", "DAILY_LAST":"Last_Price"}
+
+def _take_inverse(values):
+    ''' 1/x, leaving zeros as zero. '''
+    values = values.astype(float)
+    return values.where(values == 0.0, 1/values.where(values != 0.0))
+
+TRANSFORMS = {"inverse":_take_inverse}
+
+def _inverse(value):
+    return value if not value else 1/value
+
+# TRANSFORMS for one float (the record path); None passes through.
+RECORD_TRANSFORMS = {"inverse":_inverse}
+
+
+def get_registry_df():
+    ''' PRODUCTS as a df indexed by Data_Set, in registry order. '''
+    registry = pd.DataFrame.from_dict(PRODUCTS, orient="index")[["short_name", "sql_column", "price_field", "transform"]]
+    registry.index.name = "Data_Set"
+    registry["order"] = np.arange(len(registry))
+    return registry
+
+def get_null_column_handlers(data_set):
+    return PRODUCTS.get(data_set, {}).get("null_column_handlers", NULL_COLUMN_HANDLERS)
+
+def select_product_prices(df, as_of=None):
+    '''
+        Long form of every row of a registered
+        product: Date, Data_Set, Product, Month,
+        Curve_Position (1 = front month), Price.
+        Price is the registry's price field with
+        its transform applied. Date is TRADE_DATE
+        when present, otherwise as_of (today).
+    '''
+    registry = get_registry_df()
+    df = df[df["Data_Set"].isin(registry.index)].reset_index(drop=True)
+    product = registry.loc[df["Data_Set"]].reset_index(drop=True)
+
+    if "TRADE_DATE" in df.columns: dates = df["TRADE_DATE"].astype(str)
+    else: dates = pd.Series((as_of or datetime.datetime.now()).strftime("%Y-%m-%d"), index=df.index)
+
+    price = pd.Series(np.nan, index=df.index)
+    for price_field, column in PRICE_FIELD_COLUMNS.items():
+        if column not in df.columns: column = price_field # not yet renamed.
+        mask = product["price_field"] == price_field
+        price[mask] = df.loc[mask, column].astype(float)
+    for transform_name, transform in TRANSFORMS.items():
+        mask = product["transform"] == transform_name
+        price[mask] = transform(price[mask])
+
+    month_column = "Month" if "Month" in df.columns else "MTH_STRIKE"
+    prices = pd.DataFrame({"Date":dates, "Data_Set":df["Data_Set"], "Product":product["short_name"],
+                           "Month":df[month_column], "Price":price, "order":product["order"]})
+    prices["Curve_Position"] = prices.groupby(["Date", "Data_Set"]).cumcount() + 1
+    prices = prices.sort_values(["Date", "order", "Curve_Position"], kind="stable").drop(columns=["order"])
+    return prices[["Date", "Data_Set", "Product", "Month", "Curve_Position", "Price"]].reset_index(drop=True)
+
+def transform_df_for_azure_upsert(df, forward_curve=False, as_of=None):
+    '''
+        forward_curve=False: one row per Date with
+        a column per product (front month only),
+        the shape of the original upsert.
+        forward_curve=True: every contract month
+        in long form (see select_product_prices).
+    '''
+    prices = select_product_prices(df, as_of=as_of)
+    if forward_curve: return prices
+
+    front = prices[prices["Curve_Position"] == 1]
+    wide = front.pivot(index="Date", columns="Product", values="Price")
+    columns = [p["short_name"] for p in PRODUCTS.values() if p["short_name"] in wide.columns]
+    wide = wide[columns].reset_index()
+    wide.columns.name = None
+    return wide
+
+def select_price_records(rows, as_of=None):
+    '''
+        select_product_prices without pandas. rows:
+        dicts with Data_Set, MTH_STRIKE, SETT and
+        DAILY_LAST (floats or None), and optionally
+        TRADE_DATE. Returns the same columns as dicts.
+    '''
+    default_date = (as_of or datetime.datetime.now()).strftime("%Y-%m-%d")
+    order = {data_set:i for i, data_set in enumerate(PRODUCTS)}
+    positions = {}
+    records = []
+    for row in rows:
+        product = PRODUCTS.get(row["Data_Set"])
+        if product is None: continue
+        date = str(row.get("TRADE_DATE") or default_date)
+        price = row[product["price_field"]]
+        if product["transform"] is not None and price is not None: price = RECORD_TRANSFORMS[product["transform"]](price)
+        key = (date, row["Data_Set"])
+        positions[key] = positions.get(key, 0) + 1
+        records.append({"Date":date, "Data_Set":row["Data_Set"], "Product":product["short_name"],
+                        "Month":row["MTH_STRIKE"], "Curve_Position":positions[key], "Price":price})
+    return sorted(records, key=lambda r: (r["Date"], order[r["Data_Set"]], r["Curve_Position"]))
+
+def transform_records_for_azure_upsert(rows, forward_curve=False, as_of=None):
+    '''
+        transform_df_for_azure_upsert without pandas:
+        one dict per Date ({"Date":..., short_name:
+        price, ...} in registry order), or the long
+        records with forward_curve=True.
+    '''
+    prices = select_price_records(rows, as_of=as_of)
+    if forward_curve: return prices
+
+    wide = {}
+    for price in prices:
+        if price["Curve_Position"] == 1: wide.setdefault(price["Date"], {"Date":price["Date"]})[price["Product"]] = price["Price"]
+    return [wide[date] for date in sorted(wide)]
@@ -6,12 +6,25 @@
 # bloomberg_energy_url = "https://www.bloomberg.com/markets/api/comparison/data?securities=CL1%3ACOM,CO1%3ACOM,NG1%3ACOM&securityType=COMMODITY&locale=en"
 ####################################
 
-import os, csv, re
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
+import os, io, csv, re, copy, gzip, zipfile, tarfile, tempfile, argparse, logging
 import datetime
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cme.src.trading_calendar import TradingCalendar, DEFAULT_PUBLISH_HOUR
+from cme.src.file_cache import DatamineFileCache, CHUNK_SIZE
+from cme.src.checkpoint import BackfillCheckpoint
+from cme.src.section_index import SectionIndex
+from cme.src import products
+from common.src.parquet_output import write_partitioned_parquet
+from common.src.metrics import PipelineMetrics
+from common.src.http_transport import get_default_transport
+from common.src.lazy_import import lazy_import
+
+# Imported on first use; the record path (get_price_records) never needs them.
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
 
 # CME Datamine does not support OAuth.
 FULL_COLUMN_COUNT = 11
@@ -24,217 +37,636 @@ C1_CANADIAN_DOLLAR_US_DOLLAR_CAD_USD_FUTURES = "C1 Canadian Dollar/U.S. Dollar (
 EC_EURO_US_DOLLAR_EUR_USD_FUTURES = "EC Euro/U.S. Dollar (EUR/USD) Futures"
 NG_HENRY_HUB_NATURAL_GAS_FUTURES = "NG Henry Hub Natural Gas Futures"
 
+UPSERT_COLUMN_NAMES = {"DATA_SET":"Data_Set", "MTH_STRIKE":"Month", "SETT":"Settlement_Price", "DAILY_LAST":"Last_Price"}
+# Columns clean_df keeps for the upsert and Parquet paths.
+CLEAN_COLUMNS = ["TRADE_DATE", "DATA_SET", "MTH_STRIKE", "SETT", "DAILY_LAST"]
+
+COLUMNS = ["MTH_STRIKE", "DAILY_OPEN", "DAILY_HIGH", "DAILY_LOW", "DAILY_LAST", 
+           "SETT", "PNT_CHGE", "ACT_EST_VOL", "PREV_DAY_SETT", "PREV_DAY_VOL", "PREV_DAY_INT"]
+# Whole-number columns (Int64); the rest after MTH_STRIKE are float64.
+COUNT_COLUMNS = ["ACT_EST_VOL", "PREV_DAY_VOL", "PREV_DAY_INT"]
+
+# Report file (fid) -> sections pulled from it.
+FID_DICT = {"STLBASIC_NYMEX_STLCPC_EOM_0": [_26_CRUDE_OIL_LAST_DAY_FINANCIAL_FUTURES,
+                                            B0_MONT_BELVIEU_LDH_PROPANE_OPIS_FUTURES,
+                                            BZ_BRENT_CRUDE_OIL_LAST_DAY_FINANCIAL_FUTURES,
+                                            C0_MONT_BELVIEU_ETHANE_OPIS_FUTURES
+                                           ],
+            "STLBASIC_SETLCUR_EOM_SUM_0": [C1_CANADIAN_DOLLAR_US_DOLLAR_CAD_USD_FUTURES,
+                                           EC_EURO_US_DOLLAR_EUR_USD_FUTURES
+                                          ],
+            "STLBASIC_NYMEX_EOM_SUM_0": [NG_HENRY_HUB_NATURAL_GAS_FUTURES
+                                         ]
+}
+
+
+def _scan_report_lines(report_lines, search_header_strs, search_footer_str="TOTAL", source="report"):
+    '''
+        Single pass over the report. Collects the
+        lines between each header and its footer
+        for every search string at once.
+        Returns {header_str: [lines]}.
+    '''
+    pending = list(search_header_strs)
+    active = {}
+    section_lines = {}
+    for line in report_lines:
+        if active:
+            if search_footer_str in line:
+                logger.debug("Footer in %s: %s", source, line.strip())
+                section_lines.update(active)
+                active = {}
+                if not pending: break
+                continue
+            for lines in active.values(): lines.append(line)
+        for header_str in [h for h in pending if h in line]:
+            logger.debug("Header in %s: %s", source, line.strip())
+            pending.remove(header_str)
+            active[header_str] = []
+    section_lines.update(active) # no footer; keep to end of file.
+
+    if pending:
+        raise ValueError(f"Section(s) not found in {source}: {pending}")
+    return section_lines
+
+def _scan_report_sections(file_path, search_header_strs, search_footer_str="TOTAL", persist_index=False):
+    '''
+        Random access through the file's section
+        index (memory-mapped; see section_index.py).
+        persist_index keeps the offsets next to the
+        file for later runs.
+    '''
+    index = SectionIndex(file_path, footer=search_footer_str, persist=persist_index)
+    section_lines = index.get_section_lines(search_header_strs, source=file_path)
+    for header_str, lines in section_lines.items():
+        logger.debug("Section in %s: %s (%d lines)", file_path, header_str, len(lines))
+    return section_lines
+
+def _iter_archive_members(archive_path):
+    '''
+        Yields (name, binary file object) for each
+        file in a zip or tar archive. Members are
+        decompressed as they are read, never
+        extracted in full; .gz members are unwrapped.
+    '''
+    def _open_member(name, f):
+        return gzip.GzipFile(fileobj=f) if name.endswith(".gz") else f
+
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as zf:
+            for info in zf.infolist():
+                if info.is_dir(): continue
+                with zf.open(info) as f:
+                    yield info.filename, _open_member(info.filename, f)
+    else:
+        with tarfile.open(archive_path, 'r:*') as tf:
+            for member in tf:
+                if not member.isfile(): continue
+                f = tf.extractfile(member)
+                try: yield member.name, _open_member(member.name, f)
+                finally: f.close()
+
+def _sections_to_dfs(section_lines, data_sets):
+    ''' All 11 columns are kept; see _section_lines_to_df. '''
+    dict_dfs = {}
+    for data_set in data_sets:
+        dict_dfs[data_set] = _section_lines_to_df(data_set=data_set, lines=section_lines[data_set])
+    return dict_dfs
+
+def _get_trimmed_line_list(data_set, line):
+    '''
+        Fallback for sections the fixed-width
+        slicer rejects. Blank columns are guessed
+        from the token count with the dataset's
+        handler table (see products.py).
+
+        Returns the row as a list of fields,
+        padded with '' for blank columns.
+    '''
+
+    list_h = products.get_null_column_handlers(data_set) # dataset level
+    line_list = line.split()
+    list_count = len(line_list)
+
+    # trim with new_line_list:
+    if list_count < FULL_COLUMN_COUNT and list_count in list_h.keys():
+        new_line_list = []
+        for i_field, field in enumerate(line_list, 0):
+            new_line_list.append(field)
+            for i_col, ncol in list_h[list_count]:
+                if i_col == i_field:
+                    # doesn't pass on wrong field--good.
+                    new_line_list.extend([''] * ncol)
+        line_list = new_line_list
+    return line_list
+
+def _section_char_matrix(lines):
+    '''
+        Lines as an (n_rows, width) uint8 array,
+        space padded, plus one trailing blank column
+        so every token has a right edge.
+    '''
+    width = max(map(len, lines)) + 1
+    text = "".join([line.ljust(width) for line in lines])
+    return np.frombuffer(text.encode("ascii", "replace"), dtype=np.uint8).reshape(len(lines), width)
+
+def _infer_column_edges(occupied, token_ends, token_counts):
+    '''
+        Right edge of each of the 11 columns
+        (numbers are right-aligned). Taken from
+        the rows that have every field; if there
+        are none, from the runs of non-blank
+        character positions across the section.
+        Returns None when neither works.
+    '''
+    full_rows = token_counts == FULL_COLUMN_COUNT
+    if full_rows.any():
+        ends = np.nonzero(token_ends[full_rows])[1].reshape(-1, FULL_COLUMN_COUNT) + 1
+        return np.median(ends, axis=0).astype(int)
+
+    any_occupied = occupied.any(axis=0)
+    edges = np.flatnonzero(any_occupied[:-1] & ~any_occupied[1:]) + 1
+    return edges if len(edges) == FULL_COLUMN_COUNT else None
+
+def _typed_section_df(mat, bounds):
+    '''
+        Section char matrix cut at bounds (column k
+        is mat[:, bounds[k]:bounds[k+1]]) -> the
+        section df: MTH_STRIKE as text, prices and
+        PNT_CHGE as float64 ("UNCH" is 0), volumes
+        and open interest as Int64. Blanks are
+        missing. Flag suffixes (A/B) and any other
+        non-numeric characters are blanked in one
+        array operation, then each column is cast
+        straight from its bytes.
+    '''
+    digits = (mat - np.uint8(ord("0"))) < 10
+    numeric = digits | (mat == ord(".")) | (mat == ord("-")) | (mat == ord("+"))
+    n_digits = np.add.reduceat(digits, bounds[:-1], axis=1)
+    months = np.ascontiguousarray(mat[:, bounds[0]:bounds[1]]).view(f"S{bounds[1] - bounds[0]}")[:, 0]
+    data = {"MTH_STRIKE":np.array([m.decode("ascii").strip() or None for m in months.tolist()], dtype=object)}
+    k_change = COLUMNS.index("PNT_CHGE")
+    unchanged = (mat[:, bounds[k_change]:bounds[k_change + 1]] == ord("U")).any(axis=1)
+
+    mat = mat*numeric + np.uint8(ord(" "))*~numeric
+    for k, col in enumerate(COLUMNS[1:], 1):
+        start, end = bounds[k], bounds[k + 1]
+        field = np.ascontiguousarray(mat[:, start:end])
+        empty = n_digits[:, k] == 0
+        field[empty] = ord(" "); field[empty, -1] = ord("0") # parsed as 0, then set missing.
+        text = field.view(f"S{end - start}")[:, 0]
+        try:
+            values = text.astype(np.float64)
+        except ValueError: # malformed field (e.g. two "."); first number in each, as clean_df.
+            values = np.array([_to_float(v.decode("ascii")) or 0.0 for v in text])
+        values[empty] = np.nan
+        if col == "PNT_CHGE": values[empty & unchanged] = 0.0
+        if col in COUNT_COLUMNS: values = pd.arrays.IntegerArray(np.where(empty, 0, np.round(values)).astype(np.int64), empty)
+        data[col] = values
+    return pd.DataFrame(data, columns=COLUMNS)
+
+def _field_chars(values):
+    ''' Field strings as an (n_rows, width) uint8 array (space padded). '''
+    encoded = [v.encode("ascii", "replace") for v in values]
+    width = max(1, max(map(len, encoded), default=0))
+    return np.array([v.ljust(width) for v in encoded], dtype=f"S{width}").view(np.uint8).reshape(len(encoded), width)
+
+def _get_section_bounds(lines):
+    '''
+        (char matrix, bounds) for a section, column
+        k being mat[:, bounds[k]:bounds[k+1]]; None
+        if the layout does not line up and the token
+        parser is needed. Shared by the df and the
+        record paths.
+    '''
+    mat = _section_char_matrix(lines)
+    occupied = mat != ord(" ")
+    token_starts = occupied.copy(); token_starts[:, 1:] &= ~occupied[:, :-1]
+    token_ends = occupied[:, :-1] & ~occupied[:, 1:]
+    token_counts = token_starts.sum(axis=1)
+
+    edges = _infer_column_edges(occupied, token_ends, token_counts)
+    if edges is None: return None
+    if edges[-1] >= mat.shape[1]:
+        mat = np.pad(mat, ((0, 0), (0, edges[-1] - mat.shape[1] + 1)), constant_values=ord(" "))
+        occupied = mat != ord(" ")
+
+    # Column k is [edges[k-1], edges[k]); the boundary characters must be blank in every row.
+    bounds = [0] + [int(e) for e in edges[:-1]] + [mat.shape[1]]
+    if occupied[:, bounds[1:-1]].any(): return None
+
+    # A token split across columns (or two merged into one) changes the field count.
+    filled = np.column_stack([occupied[:, start:end].any(axis=1) for start, end in zip(bounds[:-1], bounds[1:])])
+    if not np.array_equal(filled.sum(axis=1), token_counts): return None
+    return mat, bounds
+
+def _slice_fixed_width(lines):
+    '''
+        Cuts the whole section at the inferred
+        column boundaries: each column is a slice of
+        the char matrix, typed in one vectorised
+        pass (see _typed_section_df). Returns None
+        when the token parser is needed.
+    '''
+    section = _get_section_bounds(lines)
+    return None if section is None else _typed_section_df(*section)
+
+def _section_lines_to_df(data_set, lines):
+    '''
+        Builds the section df straight from memory.
+        The fixed-width slicer recovers all 11
+        columns; sections it cannot align fall back
+        to the per-token handlers. Both give the
+        same typed columns.
+    '''
+    lines = [line for line in map(str.rstrip, lines) if line]
+    if not lines: return _typed_section_df(np.zeros((0, FULL_COLUMN_COUNT), dtype=np.uint8), list(range(FULL_COLUMN_COUNT + 1)))
+    df = _slice_fixed_width(lines)
+    if df is not None: return df
+
+    rows = [(_get_trimmed_line_list(data_set, line) + [''] * FULL_COLUMN_COUNT)[:FULL_COLUMN_COUNT] for line in lines]
+    columns = [_field_chars([row[i] for row in rows]) for i in range(FULL_COLUMN_COUNT)]
+    return _typed_section_df(np.hstack(columns), list(np.cumsum([0] + [c.shape[1] for c in columns])))
+
+_NUMBER = re.compile(r'[-+]?(\d+\.?\d*|\.\d+)')
+
+def _to_float(field):
+    ''' The slicer's rule for one field: the first signed number, flags dropped (None if there is none). '''
+    match = _NUMBER.search(field)
+    return float(match.group(0)) if match else None
+
+def _split_fixed_width(lines):
+    '''
+        The record path's cut: the same bounds as
+        _slice_fixed_width, each field a stripped
+        string ('' for blanks). None when the token
+        parser is needed.
+    '''
+    section = _get_section_bounds(lines)
+    if section is None: return None
+    spans = list(zip(section[1][:-1], section[1][1:]))
+    return [[line[start:end].strip() for start, end in spans] for line in lines]
+
+def _section_lines_to_rows(data_set, lines, front_month=False):
+    '''
+        _section_lines_to_df as lists of field
+        strings (no pandas). front_month=True
+        returns the first row only; when it has
+        every field it is split as is and the rest
+        of the section is not parsed (a short first
+        row needs the section's layout).
+    '''
+    if front_month:
+        first = next((fields for fields in map(str.split, lines) if fields), [])
+        if not first: return []
+        if len(first) == FULL_COLUMN_COUNT: return [first]
+        return _section_lines_to_rows(data_set, lines)[:1]
+    lines = [line for line in map(str.rstrip, lines) if line]
+    if not lines: return []
+    rows = _split_fixed_width(lines)
+    if rows is not None: return rows
+    return [_get_trimmed_line_list(data_set, line) for line in lines]
+
 
 class CMEDatamineAPI:
 
-    def __init__(self):
+    def __init__(self, calendar=None, publish_hour=None, cache_dir=None, metrics=None, transport=None):
         self.api_id = os.environ["CME_API_ID"]
         self.api_pw = os.environ["CME_API_PW"]
         self.base_endpoint = "https://datamine.cmegroup.com/cme/api/v1/download"
+        self.batch_endpoint = "https://datamine.cmegroup.com/cme/api/v1/batchdownload"
+        # Exchange calendar; before publish_hour (exchange time, CME_PUBLISH_HOUR to override)
+        # today's file is not asked for.
+        self.calendar = calendar or TradingCalendar()
+        self.publish_hour = publish_hour if publish_hour is not None else int(os.environ.get("CME_PUBLISH_HOUR", DEFAULT_PUBLISH_HOUR))
+        # Optional on-disk cache keyed by (trade date, fid); None keeps the old temp-file behaviour.
+        self.cache = DatamineFileCache(cache_dir) if cache_dir else None
+        # Stage timings and counters; see common/src/metrics.py.
+        self.metrics = metrics or PipelineMetrics("cme")
+        # Pooled, rate-limited HTTP shared with eiaapi (see common/src/http_transport.py).
+        self.transport = transport or get_default_transport()
+        # fid -> trade date of the file last pulled for it (see stamp_trade_dates).
+        self.trade_dates = {}
+
+    def clone(self):
+        '''
+            Same settings, calendar, cache, transport
+            and metrics, with its own trade_dates: one
+            per task attempt, so an abandoned attempt
+            cannot stamp the retry's rows.
+        '''
+        api = copy.copy(self)
+        api.trade_dates = {}
+        return api
 
-    def get_dfs_from_fid_dict(self, fid_dict):
+    def get_dfs_from_fid_dict(self, fid_dict, max_workers=1, as_of=None, n_lookback=7):
         '''
             Calls download and processes
             the files into dfs for upsert.
-            Deletes the file as cleanup.
+            Deletes the file as cleanup unless
+            it lives in the cache.
+
+            max_workers > 1 downloads the fids
+            concurrently; each file is parsed as
+            soon as it arrives.
+
+            as_of and n_lookback are passed to
+            download_and_get_file.
         '''
-        def _process_file_into_df(file, data_set):
-            
-            def __search_string_in_file_get_header_footer(file_path, search_header_str, search_footer_str):
-                """Searches for a string in a text file and prints matching lines."""
-                with open(file_path, 'r') as file:
-                    for row_number, line in enumerate(file, 1):
-                        if search_header_str in line:
-                            print(line.strip())
-                            header_row_number = row_number
-
-                            for r_n, line2 in enumerate(file, row_number):
-                                if search_footer_str in line2:
-                                    print(line2.strip())
-                                    footer_row_number = r_n
-                                    break
-                            break
-                    file.close()
-                return header_row_number, footer_row_number
-            
-            def __extract_subset_file_to_df(file_path, data_set, header_row_number, footer_row_number):
-                '''Extract specific subset; simplifies dataframe creation'''
-
-                def ___get_trimmed_line_list(data_set, line):
-                    '''
-                        This is specific to the dataset.
-                        Each new dataset needs its own
-                        logic.
-
-                        CSV reader delimiter requires 1 character
-                        string, special implementation logic necessary.
-                    '''
-
-                    def ____define_null_column_handlers_list(data_set):
-                        ''' Parse logic params: 
-                            {n1:[(i11, k11), (i12, k12), ...], n2:[(i21, k21), (i22, k22), ...], ...}
-                            n = Number of Columns with Data.
-                            i_ = Column iterated upon from 0 to len -1.
-                            k_ = number of '' columns to add to list
-                        '''
-
-                        # Split for customization.
-                        if data_set == _26_CRUDE_OIL_LAST_DAY_FINANCIAL_FUTURES: list_handler = {10:[(7,1)], 9:[(6, 1), (7, 1)], 8:[(6, 1), (7, 2)]}
-                        elif data_set == B0_MONT_BELVIEU_LDH_PROPANE_OPIS_FUTURES: list_handler = {10:[(7,1)], 9:[(6, 1), (7, 1)], 8:[(6, 1), (7, 2)]}
-                        elif data_set == BZ_BRENT_CRUDE_OIL_LAST_DAY_FINANCIAL_FUTURES: list_handler = {10:[(7,1)], 9:[(6, 1), (7, 1)], 8:[(6, 1), (7, 2)]}
-                        elif data_set == C0_MONT_BELVIEU_ETHANE_OPIS_FUTURES: list_handler = {10:[(7,1)], 9:[(6, 1), (7, 1)], 8:[(6, 1), (7, 2)]}
-                        elif data_set == C1_CANADIAN_DOLLAR_US_DOLLAR_CAD_USD_FUTURES: list_handler = {10:[(7,1)], 9:[(6, 1), (7, 1)], 8:[(6, 1), (7, 2)]}
-                        elif data_set == EC_EURO_US_DOLLAR_EUR_USD_FUTURES: list_handler = {10:[(7,1)], 9:[(6, 1), (7, 1)], 8:[(6, 1), (7, 2)]}
-                        elif data_set == NG_HENRY_HUB_NATURAL_GAS_FUTURES: list_handler = {10:[(7,1)], 9:[(6, 1), (7, 1)], 8:[(6, 1), (7, 2)]}
-                        return list_handler
-                    
-                    # Write data, csv style:
-                    list_h = ____define_null_column_handlers_list(data_set) # dataset level
-                    line_list = line.split()
-                    list_count = len(line_list)
-
-                    # trim with new_line_list:
-                    if list_count < FULL_COLUMN_COUNT:
-                        new_line_list = []
-                        for i_field, field in enumerate(line_list, 0):
-                            if list_count not in list_h.keys(): 
-                                new_line_list.append(field)
-                            else:
-                                new_line_list.append(field)
-                                for i_col, ncol in list_h[list_count]:
-                                    if i_col == i_field:
-                                        # doesn't pass on wrong field--good.
-                                        for _ in range(ncol): 
-                                            new_line_list.append('')
-                        line_list = new_line_list
-                    else:
-                        pass
-                    trimmed_line = ",".join(line_list)
-                    trimmed_line = f"\n{trimmed_line}"
-                    return trimmed_line
-                
-                outfile = f"Output_{file_path}"
-                # Write header, csv style:
-                with open(file_path, 'r') as infile, open(outfile, 'w') as outfile:
-                    columns = ["MTH_STRIKE", "DAILY_OPEN", "DAILY_HIGH", "DAILY_LOW", "DAILY_LAST", 
-                               "SETT", "PNT_CHGE", "ACT_EST_VOL", "PREV_DAY_SETT", "PREV_DAY_VOL", "PREV_DAY_INT"]
-                    for col in columns[:-1]: 
-                        col_ = f"{col},"
-                        outfile.write(col_)
-                    outfile.write(columns[-1])
-
-                    # Write data, csv style:
-                    for i_row, line in enumerate(infile):
-                        if i_row >= header_row_number and i_row < footer_row_number:
-                            print(line)
-                            line_list = line.split()
-                            trimmed_line = ",".join(line_list)
-                            trimmed_line = f"\n{trimmed_line}"
-
-                            trimmed_line = ___get_trimmed_line_list(data_set, line) # trim it.
-                            outfile.write(trimmed_line)
-                    infile.close()
-                    outfile.close()
-                outfile = f"Output_{file_path}" # reinitialize.
-                df = pd.read_csv(filepath_or_buffer=outfile, delimiter=',')
-                os.remove(f"Output_{file_path}") # remove extraction file.
-
-                return df
-            
-            def __clean_inconsistent_columns(df):
-                ''' 
-                Only Columns 0 to 6 are useable and 
-                necessary. Others require more
-                extensive parsing.
-                '''
-                df_ = df.iloc[:, :6]
-                return df_
-
-            # Search file
-            header, footer = __search_string_in_file_get_header_footer(file_path=file, search_header_str=data_set, search_footer_str="TOTAL")
-            df = __extract_subset_file_to_df(file_path=file, data_set=data_set, header_row_number=header, footer_row_number=footer )
-            df = __clean_inconsistent_columns(df)
-            return df
-        
+        def _download_and_process(fid, data_sets):
+            return self._parse_sections(self._get_section_lines(fid, data_sets, as_of=as_of, n_lookback=n_lookback), data_sets)
+
         # Entry:
         # ``````
-        dict_dfs = {}
-        for fid, data in fid_dict.items():
-            file_name = self.download_and_get_file(fid=fid)
+        fid_dfs = self._map_fids(_download_and_process, fid_dict, max_workers=max_workers)
 
-            for data_set in data:
-                df = _process_file_into_df(file_name, data_set)
-                dict_dfs[data_set] = df
+        # Keep fid_dict order for the concat.
+        dict_dfs = {}
+        for fid in fid_dict:
+            dict_dfs.update(fid_dfs[fid])
+        return dict_dfs
 
-            os.remove(file_name)
+    def _get_section_lines(self, fid, data_sets, as_of=None, n_lookback=7):
+        '''
+            Downloads the fid's latest file and reads
+            every requested section in one pass (see
+            _scan_report_sections). The file is deleted
+            afterwards unless it lives in the cache.
+        '''
+        with self.metrics.stage("download", fid=fid):
+            file_name = self.download_and_get_file(fid=fid, as_of=as_of, n_lookback=n_lookback)
+        if not file_name:
+            raise ValueError(f"No settlement file found for {fid}.")
+        try:
+            with self.metrics.stage("section_search", source=file_name):
+                return _scan_report_sections(file_path=file_name, search_header_strs=data_sets, search_footer_str="TOTAL",
+                                             persist_index=self.cache is not None)
+        finally:
+            if self.cache is None: os.remove(file_name)
+
+    def _map_fids(self, func, fid_dict, max_workers=1):
+        ''' {fid: func(fid, data_sets)}; the fids run concurrently when max_workers > 1. '''
+        if max_workers > 1 and len(fid_dict) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(fid_dict))) as executor:
+                futures = {executor.submit(func, fid, data): fid for fid, data in fid_dict.items()}
+                return {futures[future]:future.result() for future in as_completed(futures)}
+        return {fid:func(fid, data) for fid, data in fid_dict.items()}
+
+    def _parse_sections(self, section_lines, data_sets):
+        ''' _sections_to_dfs, timed, with rows per section recorded. '''
+        with self.metrics.stage("parse"):
+            dict_dfs = _sections_to_dfs(section_lines, data_sets)
+        for data_set, df in dict_dfs.items():
+            self.metrics.record_section(data_set, len(df))
         return dict_dfs
     
-    def download_and_get_file(self, fid):
+    def get_price_records(self, fid_dict, forward_curve=False, max_workers=1, as_of=None, n_lookback=7):
+        '''
+            Lean path for the daily numbers: the same
+            downloads and section index, but sections
+            are cut into plain rows and typed with the
+            slicer's rule (_to_float); no df is built
+            and pandas is never imported. Returns the rows of
+            transform_df_for_azure_upsert as dicts
+            (see products.transform_records_for_azure_upsert).
+        '''
+        def _download_and_parse(fid, data_sets):
+            section_lines = self._get_section_lines(fid, data_sets, as_of=as_of, n_lookback=n_lookback)
+            trade_date = self.trade_dates[fid].strftime("%Y-%m-%d")
+            rows = []
+            with self.metrics.stage("parse"):
+                for data_set in data_sets:
+                    lines = section_lines[data_set]
+                    self.metrics.record_section(data_set, sum(1 for line in lines if line.strip()))
+                    for fields in _section_lines_to_rows(data_set, lines, front_month=not forward_curve):
+                        row = dict(zip(COLUMNS, fields))
+                        rows.append({"TRADE_DATE":trade_date, "Data_Set":data_set, "MTH_STRIKE":row.get("MTH_STRIKE"),
+                                     "SETT":_to_float(row.get("SETT", "")), "DAILY_LAST":_to_float(row.get("DAILY_LAST", ""))})
+            return rows
+
+        # Entry:
+        # ``````
+        parsed = self._map_fids(_download_and_parse, fid_dict, max_workers=max_workers)
+        with self.metrics.stage("transform"):
+            return products.transform_records_for_azure_upsert([row for fid in fid_dict for row in parsed[fid]], forward_curve=forward_curve)
+
+    def is_published(self, fid, trade_date):
+        '''
+            Cheap probe for watch mode: is the file for
+            trade_date up? A cached copy answers from
+            the index (no hashing); otherwise the first
+            byte is requested (Range: bytes=0-0) and
+            read, so the pooled connection is kept.
         '''
-            Receives fid and looks back to previous
-            days, accounting for weekends and 
-            holidays and downloads most recent
-            file.
+        fid_date = trade_date.strftime("%Y%m%d")
+        if self.cache is not None and self.cache.contains(fid_date, fid): return True
+        url = f"{self.base_endpoint}?fid={fid_date}-{fid}"
+        self.metrics.incr("probes")
+        response = self.transport.get(url, metrics=self.metrics, auth=(self.api_id, self.api_pw), headers={"Range":"bytes=0-0"})
+        response.content # drain; a server that ignores Range sends the whole file.
+        return response.status_code in (200, 206)
+
+    def download_and_get_file(self, fid, as_of=None, n_lookback=7):
+        '''
+            Receives fid and downloads the most
+            recent settlement file. The trade date
+            comes from the exchange calendar, so
+            weekends and holidays are never probed.
+            Falls back over previous trading days
+            if the file is not yet published.
+
+            The body is streamed to disk in chunks.
+            With a cache, each trading day is checked
+            there first and downloads are stored in it.
         '''
 
         def _execute_call(fid_endpoint):
-            # Define the retry strategy.
-            retry_strategy = Retry(
-                total=4,  # Maximum number of retries.
-                status_forcelist=[429, 500, 502, 503, 504],  # the HTTP status codes to retry on.
-            )
-
-            adapter = HTTPAdapter(max_retries=retry_strategy)
-            
-            # Create a new session object.
-            session = requests.Session()
-            session.mount("https://", adapter)
-
-            # Make a request using the session object.
+            # Pooled connection; retries and throttling are the transport's.
             url = f"{self.base_endpoint}?fid={fid_endpoint}"
-            response = session.get(url, auth=(self.api_id, self.api_pw))
+            response = self.transport.get(url, metrics=self.metrics, auth=(self.api_id, self.api_pw), stream=True)
+            self.metrics.record_response(response)
             return response, url
         
-        def _get_last_business_day(today_datetime, n_past_days):
-            # Corrects for Holidays.
-            check_datetime = today_datetime - datetime.timedelta(days=n_past_days)
-            
-            if check_datetime.weekday() == 6:
-                n_past_days = n_past_days+2
-                last_bus_datetime = today_datetime - datetime.timedelta(days=(n_past_days+2))
-            elif check_datetime.weekday() == 5:
-                n_past_days = n_past_days+1
-                last_bus_datetime = today_datetime - datetime.timedelta(days=(n_past_days+1))
-            else:
-                last_bus_datetime = datetime.datetime.now() - datetime.timedelta(days=n_past_days)
-            return n_past_days, last_bus_datetime
-        
-        # Entry: 7-day lookback for Holidays.
-        today_datetime = datetime.datetime.now()
+        # Entry: lookback over trading days only.
+        today_datetime = as_of or datetime.datetime.now()
+        last_settlement_date = self.calendar.last_settlement_date(as_of=today_datetime, publish_hour=self.publish_hour)
+        file_name = ""
+
+        for last_bus_date in self.calendar.previous_trading_days(last_settlement_date, n_lookback):
+            fid_date = last_bus_date.strftime("%Y%m%d")
+            if self.cache is not None:
+                file_name = self.cache.get(fid_date, fid) or ""
+                if file_name:
+                    self.metrics.incr("cache_hits")
+                    logger.info("Cache hit for %s-%s.", fid_date, fid)
+                    self.trade_dates[fid] = last_bus_date
+                    break
 
-        for i in range(7):
-            i, last_bus_datetime = _get_last_business_day(today_datetime=today_datetime, n_past_days=i)
-            # Force here:
-            fid_date = last_bus_datetime.strftime("%Y%m%d")
             fid_endpoint = f"{fid_date}-{fid}"
             response, url = _execute_call(fid_endpoint)
 
-            if response.status_code == 200:
-                # File downloaded successfully.
-                fid_datetime = today_datetime.strftime("%Y-%m-%d_%H-%M-%S")
-                file_name = "_".join((fid.replace(" ", ""), f"{fid_datetime}.txt"))
-                with open(file_name, 'wb') as f:
-                    f.write(response.content)
-                    f.close()
-                print(f"File downloaded successfully from {url}.")
-                break
-
-            else:
-                print("Error:", response.status_code)
-                file_name = ""
+            with response:
+                if response.status_code == 200:
+                    # File downloaded successfully.
+                    chunks = self.metrics.count_bytes(response.iter_content(chunk_size=CHUNK_SIZE))
+                    if self.cache is not None:
+                        file_name = self.cache.put_stream(fid_date, fid, chunks)
+                    else:
+                        fid_datetime = today_datetime.strftime("%Y-%m-%d_%H-%M-%S")
+                        file_name = "_".join((fid.replace(" ", ""), f"{fid_datetime}.txt"))
+                        with open(file_name, 'wb') as f:
+                            for chunk in chunks:
+                                f.write(chunk)
+                    logger.info("File downloaded successfully from %s.", url)
+                    self.trade_dates[fid] = last_bus_date
+                    break
+
+                else:
+                    logger.info("Error: %s %s", response.status_code, url)
 
         return file_name
 
+    def download_batch_and_get_file(self, as_of=None, n_lookback=7, dataset="eod", period="f"):
+        '''
+            One request for the day's whole EOD
+            batch archive, streamed to disk (or the
+            cache). Same trading-day lookback as
+            download_and_get_file.
+            Returns (file_name, trade date).
+        '''
+        today_datetime = as_of or datetime.datetime.now()
+        last_settlement_date = self.calendar.last_settlement_date(as_of=today_datetime, publish_hour=self.publish_hour)
+        batch_key = f"BATCH_{dataset.upper()}_{period.upper()}"
+
+        for last_bus_date in self.calendar.previous_trading_days(last_settlement_date, n_lookback):
+            fid_date = last_bus_date.strftime("%Y%m%d")
+            if self.cache is not None:
+                file_name = self.cache.get(fid_date, batch_key)
+                if file_name:
+                    self.metrics.incr("cache_hits")
+                    logger.info("Cache hit for %s-%s.", fid_date, batch_key)
+                    return file_name, last_bus_date
+
+            url = f"{self.batch_endpoint}?dataset={dataset}&yyyymmdd={fid_date}&period={period}"
+            with self.transport.get(url, metrics=self.metrics, auth=(self.api_id, self.api_pw), stream=True) as response:
+                self.metrics.record_response(response)
+                if response.status_code == 200:
+                    chunks = self.metrics.count_bytes(response.iter_content(chunk_size=CHUNK_SIZE))
+                    if self.cache is not None:
+                        file_name = self.cache.put_stream(fid_date, batch_key, chunks)
+                    else:
+                        fd, file_name = tempfile.mkstemp(prefix=f"{batch_key}_{fid_date}_", suffix=".archive", dir=".")
+                        with os.fdopen(fd, 'wb') as f:
+                            for chunk in chunks:
+                                f.write(chunk)
+                    logger.info("File downloaded successfully from %s.", url)
+                    return file_name, last_bus_date
+                else:
+                    logger.info("Error: %s %s", response.status_code, url)
+
+        return "", None
+
+    def get_dfs_from_eod_batch(self, fid_dict, as_of=None, n_lookback=7):
+        '''
+            Bulk alternative to get_dfs_from_fid_dict.
+            Pulls the EOD batch archive once and
+            scans only the members whose name holds
+            a requested fid; each member is read as
+            a stream, never unpacked in full.
+        '''
+        with self.metrics.stage("download", fid="batch"):
+            file_name, trade_date = self.download_batch_and_get_file(as_of=as_of, n_lookback=n_lookback)
+        if not file_name:
+            raise ValueError("No EOD batch archive found in the lookback window.")
+
+        try:
+            fid_dfs = {}
+            pending = {fid.replace(" ", ""): fid for fid in fid_dict}
+            for name, member in _iter_archive_members(file_name):
+                matches = [key for key in pending if key in os.path.basename(name)]
+                if not matches: continue
+                fid = pending.pop(max(matches, key=len))
+                text = io.TextIOWrapper(member, encoding="utf-8", errors="replace")
+                with self.metrics.stage("section_search", source=name):
+                    section_lines = _scan_report_lines(text, fid_dict[fid], search_footer_str="TOTAL", source=name)
+                fid_dfs[fid] = self._parse_sections(section_lines, fid_dict[fid])
+                self.trade_dates[fid] = trade_date
+                if not pending: break
+            if pending:
+                raise ValueError(f"Fid(s) not found in {file_name}: {list(pending.values())}")
+        finally:
+            if self.cache is None: os.remove(file_name)
+
+        # Keep fid_dict order for the concat.
+        dict_dfs = {}
+        for fid in fid_dict:
+            dict_dfs.update(fid_dfs[fid])
+        return dict_dfs
+
+    def backfill(self, fid_dict, start_date, end_date, backfill_dir, max_workers=4, use_batch=False):
+        '''
+            Pulls every trading day in [start_date,
+            end_date] across a worker pool. Each day
+            keeps all contract months and is written
+            to backfill_dir/<yyyymmdd>.csv with a
+            TRADE_DATE column. Finished days are
+            recorded in backfill_dir/checkpoint.json
+            and skipped when the backfill is rerun.
+            Returns the combined df of all finished days.
+        '''
+        def _backfill_date(trade_date):
+            # End of the trade date, so the lookback resolves to that day only.
+            as_of = datetime.datetime.combine(trade_date, datetime.time(23, 59, 59))
+            if use_batch: dict_dfs = self.get_dfs_from_eod_batch(fid_dict=fid_dict, as_of=as_of, n_lookback=1)
+            else: dict_dfs = self.get_dfs_from_fid_dict(fid_dict=fid_dict, as_of=as_of, n_lookback=1)
+            df = self.concat_dfs_into_sum_df(dict_dfs)
+            df.insert(0, "TRADE_DATE", trade_date.strftime("%Y-%m-%d"))
+
+            output_path = os.path.join(backfill_dir, f"{trade_date.strftime('%Y%m%d')}.csv")
+            with self.metrics.stage("write", output=output_path):
+                tmp_path = f"{output_path}.part"
+                df.to_csv(tmp_path, index=False)
+                os.replace(tmp_path, output_path)
+            return output_path
+
+        # Entry:
+        # ``````
+        os.makedirs(backfill_dir, exist_ok=True)
+        checkpoint = BackfillCheckpoint(os.path.join(backfill_dir, "checkpoint.json"))
+        all_dates = self.calendar.trading_days_between(start_date, end_date)
+        trade_dates = [d for d in all_dates if not checkpoint.is_completed(d)]
+        logger.info("Backfill %s to %s: %d trading day(s) to pull.", start_date, end_date, len(trade_dates))
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(_backfill_date, d): d for d in trade_dates}
+            for future in as_completed(futures):
+                trade_date = futures[future]
+                try:
+                    checkpoint.mark_completed(trade_date, future.result())
+                    logger.info("Backfilled %s.", trade_date)
+                except Exception as e:
+                    checkpoint.mark_failed(trade_date, e)
+                    logger.warning("Backfill failed for %s: %s", trade_date, e)
+
+        keys = {checkpoint.get_key(d) for d in all_dates}
+        output_paths = [path for key, path in checkpoint.completed_outputs().items() if key in keys]
+        if not output_paths: return pd.DataFrame({})
+        return pd.concat([pd.read_csv(path) for path in output_paths], ignore_index=True)
+
+    def stamp_trade_dates(self, df, fid_dict):
+        '''
+            Adds TRADE_DATE (YYYY-MM-DD) from the file
+            each DATA_SET was pulled from, so rows carry
+            their settlement date rather than the run
+            date. Takes the concat_dfs_into_sum_df df.
+        '''
+        if "TRADE_DATE" in df.columns: return df
+        section_dates = {data_set:self.trade_dates[fid].strftime("%Y-%m-%d")
+                         for fid, data_sets in fid_dict.items() if fid in self.trade_dates for data_set in data_sets}
+        df = df.copy()
+        df.insert(0, "TRADE_DATE", df["DATA_SET"].map(section_dates))
+        return df
+
     def trim_top_month_on_dfs(self, dict_dfs):
         dict_dfs_ = dict()
         for k, df in dict_dfs.items():
@@ -252,73 +684,91 @@ class CMEDatamineAPI:
         '''
             Remove non-numeric columns.
         '''
-        
-        df = df[columns_to_keep]
-        df = df.astype(str)
-        for col in df.columns:
-            if col not in ["MTH_STRIKE", "DATA_SET"]:
-                # df[col] = "0.771A" # test -- good
-                df[col] = df[col].str.replace(r'^\.', '0.', regex=True)
-                df[col] = df[col].str.extract(r'(\d+\.?\d*)', expand=False).astype(float)
-        return df
-    
-    def transform_df_for_azure_upsert(self, df):
-
-        def _set_short_names(data_set):
-            def __take_inverse(num: float) -> float:
-                if num != 0.0:
-                    return 1/num;
-                else: return num
-            df = pd.DataFrame({"Date":[datetime.datetime.now().strftime("%Y-%m-%d")]});
-            for n, data in enumerate(data_set):
-                if data[1] == "26 Crude Oil Last Day Financial Futures":
-                    df["WTI Crude Oil"] = [data[3]] # Settlement
-                elif data[1] == "B0 Mont Belvieu LDH Propane (OPIS) Futures":
-                    df["Propane"] = [data[3]] # Settlement
-                elif data[1]  == "BZ Brent Crude Oil Last Day Financial Futures":
-                    df["Brent Crude Oil"] = [data[3]] # Settlement
-                elif data[1]  == "C0 Mont Belvieu Ethane (OPIS) Futures":
-                    df["Ethane"] = [data[3]] # Settlement
-                elif data[1]  == "C1 Canadian Dollar/U.S. Dollar (CAD/USD) Futures":
-                    df["US to CA$"] = [__take_inverse(float(data[4]))] # Last
-                elif data[1]  == "EC Euro/U.S. Dollar (EUR/USD) Futures":
-                    df["Euro to $US"] = [data[4]] # Last
-                elif data[1]  == "NG Henry Hub Natural Gas Futures":
-                    df["Nat. Gas"] = [data[3]] # Settlement
-            return df
-
-        records = df.to_records();
-        df = _set_short_names(records)
+        with self.metrics.stage("clean"):
+            df = df[columns_to_keep].copy()
+            for col in df.columns:
+                if col in ["MTH_STRIKE", "DATA_SET", "TRADE_DATE"]:
+                    df[col] = df[col].astype(str)
+                elif pd.api.types.is_numeric_dtype(df[col]):
+                    df[col] = df[col].astype(float) # already typed by the parser.
+                else:
+                    df[col] = df[col].astype(str)
+                    # df[col] = "0.771A" # test -- good
+                    df[col] = df[col].str.replace(r'^\.', '0.', regex=True)
+                    df[col] = df[col].str.extract(r'(\d+\.?\d*)', expand=False).astype(float)
         return df
 
+    def get_clean_df(self, fid_dict, forward_curve=False, use_batch=False, max_workers=None):
+        '''
+            The frame pipeline: download (EOD batch
+            or per fid), trim to the front month
+            unless forward_curve, stamp trade dates,
+            clean and rename (UPSERT_COLUMN_NAMES).
+            Feeds transform_df_for_azure_upsert and
+            write_parquet.
+        '''
+        if use_batch: dict_dfs = self.get_dfs_from_eod_batch(fid_dict=fid_dict)
+        else: dict_dfs = self.get_dfs_from_fid_dict(fid_dict=fid_dict, max_workers=max_workers or len(fid_dict))
+        if not forward_curve: dict_dfs = self.trim_top_month_on_dfs(dict_dfs=dict_dfs)
+        df = self.stamp_trade_dates(self.concat_dfs_into_sum_df(dict_dfs), fid_dict)
+        return self.clean_df(df, CLEAN_COLUMNS).rename(columns=UPSERT_COLUMN_NAMES)
+    
+    def transform_df_for_azure_upsert(self, df, forward_curve=False):
+        '''
+            Registry-driven; see products.py.
+            forward_curve=True keeps every
+            contract month (skip the trim).
+        '''
+        with self.metrics.stage("transform"):
+            return products.transform_df_for_azure_upsert(df, forward_curve=forward_curve)
 
-    # Batch download endpoint:
-    # 'https://datamine.cmegroup.com/cme/api/v1/batchdownload?dataset=eod&yyyymmdd=20241120&period=f'
-    url = 'https://datamine.cmegroup.com/cme/api/v1/batchdownload?dataset=eod&yyyymmdd=20241120&period=f'
+    def write_parquet(self, df, output_dir):
+        '''
+            Typed Parquet handoff for Spark: the long
+            form prices (select_product_prices) plus
+            Product_Key (the registry's sql_column),
+            partitioned by Date and Product_Key.
+            Takes the cleaned, renamed df.
+        '''
+        prices = products.select_product_prices(df)
+        prices["Product_Key"] = prices["Data_Set"].map({k:p["sql_column"] for k, p in products.PRODUCTS.items()})
+        prices["Curve_Position"] = prices["Curve_Position"].astype("int32")
+        prices["Price"] = prices["Price"].astype("float64")
+        with self.metrics.stage("write", output=output_dir):
+            return write_partitioned_parquet(prices, output_dir, partition_cols=["Date", "Product_Key"])
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description="Pull CME settlements; --start/--end runs a backfill.")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="Backfill start date (YYYY-MM-DD).")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="Backfill end date (YYYY-MM-DD); defaults to today.")
+    parser.add_argument("--backfill-dir", default="cme_backfill")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--forward-curve", action="store_true", help="Keep every contract month, not just the front month.")
+    parser.add_argument("--parquet-dir", help="Also write the prices as Parquet partitioned by Date and product.")
+    args = parser.parse_args()
+    # Quiet by default; LOG_LEVEL=INFO adds download status and the metrics summary, DEBUG every stage.
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
     fid_date = datetime.datetime.now().strftime("%Y%m%d")
 
-    fid_dict = {"STLBASIC_NYMEX_STLCPC_EOM_0": [_26_CRUDE_OIL_LAST_DAY_FINANCIAL_FUTURES,
-                                                B0_MONT_BELVIEU_LDH_PROPANE_OPIS_FUTURES,
-                                                BZ_BRENT_CRUDE_OIL_LAST_DAY_FINANCIAL_FUTURES,
-                                                C0_MONT_BELVIEU_ETHANE_OPIS_FUTURES
-                                               ],
-                "STLBASIC_SETLCUR_EOM_SUM_0": [C1_CANADIAN_DOLLAR_US_DOLLAR_CAD_USD_FUTURES,
-                                               EC_EURO_US_DOLLAR_EUR_USD_FUTURES
-                                              ],
-                "STLBASIC_NYMEX_EOM_SUM_0": [NG_HENRY_HUB_NATURAL_GAS_FUTURES
-                                             ]
-    }
+    fid_dict = FID_DICT
     
-    cme = CMEDatamineAPI()
-    dict_dfs = cme.get_dfs_from_fid_dict(fid_dict=fid_dict)
-    dict_dfs = cme.trim_top_month_on_dfs(dict_dfs=dict_dfs)
-    df = cme.concat_dfs_into_sum_df(dict_dfs)
-    df = cme.clean_df(df, ["DATA_SET", "MTH_STRIKE", "SETT", "DAILY_LAST"])
-    df.rename(columns={"DATA_SET":"Data_Set", "MTH_STRIKE":"Month", "SETT":"Settlement_Price", "DAILY_LAST":"Last_Price"}, inplace=True)
-    df = cme.transform_df_for_azure_upsert(df)
+    cme = CMEDatamineAPI(cache_dir=os.environ.get("CME_CACHE_DIR"))
+    if args.start:
+        df = cme.backfill(fid_dict=fid_dict, start_date=args.start, end_date=args.end or datetime.date.today(),
+                          backfill_dir=args.backfill_dir, max_workers=args.workers, use_batch=bool(os.environ.get("CME_USE_BATCH")))
+        if args.parquet_dir:
+            df_ = cme.clean_df(df, CLEAN_COLUMNS).rename(columns=UPSERT_COLUMN_NAMES)
+            cme.write_parquet(df_, args.parquet_dir)
+        cme.metrics.emit()
+        print(df)
+        raise SystemExit(0)
+
+    df = cme.get_clean_df(fid_dict, forward_curve=args.forward_curve, use_batch=bool(os.environ.get("CME_USE_BATCH")))
+    if args.parquet_dir: cme.write_parquet(df, args.parquet_dir)
+    df = cme.transform_df_for_azure_upsert(df, forward_curve=args.forward_curve)
+    cme.metrics.emit()
     print(df)
 
 #  yyyymmdd-dataset_exch_symbol_foi_spread-venue
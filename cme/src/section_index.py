@@ -0,0 +1,78 @@
+####################################
+# Notes: Byte-offset index of report sections.
+# The report is memory-mapped; each requested header
+# is found with one mmap.find and its section runs to
+# the first footer line after it. Only the section's
+# bytes are decoded, so memory does not grow with the
+# file. With persist=True the offsets are kept next
+# to the file (<file>.sections.json) and later lookups
+# go straight to the section. The sidecar is keyed to
+# the file's size and mtime and rebuilt if either
+# changes.
+####################################
+
+import os, mmap
+import threading
+
+from common.src.json_state import load_json, save_json
+
+INDEX_SUFFIX = ".sections.json"
+
+
+def get_index_path(file_path):
+    return f"{file_path}{INDEX_SUFFIX}"
+
+
+class SectionIndex:
+
+    def __init__(self, file_path, footer="TOTAL", persist=False):
+        self.file_path = file_path
+        self.footer = footer
+        self.persist = persist
+        self.index_path = get_index_path(file_path)
+        self._lock = threading.Lock()
+        stat = os.stat(file_path)
+        self._stamp = {"size":stat.st_size, "mtime_ns":stat.st_mtime_ns, "footer":footer}
+        self.sections = self._load_index() if persist else {}
+
+    def _load_index(self):
+        stored = load_json(self.index_path, {}) # corrupt; offsets are found again.
+        if any(stored.get(k) != v for k, v in self._stamp.items()): return {}
+        return {header:tuple(span) for header, span in stored.get("sections", {}).items()}
+
+    def _save_index(self):
+        save_json(self.index_path, dict(self._stamp, sections=self.sections))
+
+    def _find_section(self, mm, header):
+        ''' (start, end) of the lines after header's line up to its footer line, or None. '''
+        at = mm.find(header.encode())
+        if at < 0: return None
+        line_end = mm.find(b"\n", at)
+        start = len(mm) if line_end < 0 else line_end + 1
+        footer_at = mm.find(self.footer.encode(), start)
+        end = len(mm) if footer_at < 0 else mm.rfind(b"\n", start, footer_at) + 1 or start
+        return (start, end)
+
+    def get_section_lines(self, headers, source=None):
+        '''
+            {header: [lines]} for every header, the
+            same shape as _scan_report_lines. Raises
+            ValueError if a header is not in the file.
+        '''
+        if self._stamp["size"] == 0:
+            raise ValueError(f"Section(s) not found in {source or self.file_path}: {list(headers)}")
+        section_lines = {}
+        with open(self.file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with self._lock:
+                missing = [h for h in headers if h not in self.sections]
+                for header in missing:
+                    span = self._find_section(mm, header)
+                    if span is not None: self.sections[header] = span
+                if self.persist and any(h in self.sections for h in missing): self._save_index()
+            not_found = [h for h in headers if h not in self.sections]
+            if not_found:
+                raise ValueError(f"Section(s) not found in {source or self.file_path}: {not_found}")
+            for header in headers:
+                start, end = self.sections[header]
+                section_lines[header] = mm[start:end].decode("utf-8", errors="replace").splitlines(keepends=True)
+        return section_lines
@@ -0,0 +1,125 @@
+####################################
+# Notes: Spark-native parsing of Datamine reports for
+# large backfills. Files are read with binaryFiles and
+# every file is parsed on an executor with the same
+# section scanner and fixed-width slicer as
+# pull_cme_data; the driver only sees the result.
+# Columns come out typed as in _section_lines_to_df:
+# TRADE_DATE a date, prices double, volumes and open
+# interest long.
+# Executors need this package: sc.addPyFile(<cme zip>).
+#
+# Each file needs a fid and a trade date. Neither
+# Datamine download naming carries the trade date:
+#   <fid>_<YYYY-MM-DD_HH-MM-SS>.txt (download time)
+#   <cache_dir>/objects/<sha256> (DatamineFileCache)
+# so cached blobs are mapped through the cache's
+# index.json (get_cache_path_map). Other files are
+# matched by name: the fid with spaces removed plus
+# a yyyymmdd trade date, e.g. <fid>_<yyyymmdd>.txt;
+# without a yyyymmdd TRADE_DATE is left null.
+#
+# Usage (Synapse):
+#   index = json.loads(spark.read.text(".../cme_cache/index.json", wholetext=True).first()[0])
+#   df = parse_reports_on_spark(spark, ".../cme_cache/objects/*", fid_dict, path_map=get_cache_path_map(index, fid_dict))
+####################################
+
+import os, re
+import logging
+import datetime
+
+from pyspark.sql import types as T
+
+from cme.src.pull_cme_data import COLUMNS, COUNT_COLUMNS, _scan_report_lines, _sections_to_dfs
+
+SCHEMA = T.StructType([T.StructField("TRADE_DATE", T.DateType()),
+                       T.StructField("FID", T.StringType()),
+                       T.StructField("DATA_SET", T.StringType()),
+                       T.StructField("MTH_STRIKE", T.StringType())]
+                      + [T.StructField(col, T.LongType() if col in COUNT_COLUMNS else T.DoubleType()) for col in COLUMNS[1:]])
+
+_TRADE_DATE_RE = re.compile(r"(?<!\d)(\d{8})(?!\d)")
+
+logger = logging.getLogger(__name__)
+
+
+def _get_fid_for_path(path, fids):
+    ''' Longest fid whose name (spaces removed) is in the file name. '''
+    name = os.path.basename(path)
+    matches = [fid for fid in fids if fid.replace(" ", "") in name]
+    return max(matches, key=len) if matches else None
+
+def _get_trade_date_for_path(path):
+    ''' yyyymmdd in the file name as YYYY-MM-DD (None for Datamine download names). '''
+    match = _TRADE_DATE_RE.search(os.path.basename(path))
+    if match is None: return None
+    d = match.group(1)
+    return f"{d[:4]}-{d[4:6]}-{d[6:]}"
+
+def get_cache_path_map(index, fid_dict):
+    '''
+        index: the parsed index.json of a
+        DatamineFileCache ({"<yyyymmdd>-<fid>":
+        {"sha256": ...}}). Returns {sha256 (the
+        blob's file name): [(fid, YYYY-MM-DD)]}
+        for the fids in fid_dict; a list since
+        identical reports share one blob.
+    '''
+    fids = {fid.replace(" ", ""):fid for fid in fid_dict}
+    path_map = {}
+    for key, entry in index.items():
+        fid_date, _, fid = key.partition("-")
+        if fid not in fids: continue
+        path_map.setdefault(entry["sha256"], []).append((fids[fid], f"{fid_date[:4]}-{fid_date[4:6]}-{fid_date[6:]}"))
+    return path_map
+
+def _get_file_keys(path, fid_dict, path_map):
+    ''' [(fid, trade_date)] for a file: from path_map by file name, else from the name itself. '''
+    name = os.path.basename(path)
+    if path_map and name in path_map: return path_map[name]
+    fid = _get_fid_for_path(path, fid_dict)
+    return [] if fid is None else [(fid, _get_trade_date_for_path(path))]
+
+def _get_section_rows(df):
+    ''' Section df -> tuples of plain Python values in COLUMNS order (None for missing). '''
+    return zip(*[df[col].astype(object).where(df[col].notna(), None).tolist() for col in COLUMNS])
+
+def _parse_partition(files, fid_dict, path_map=None):
+    '''
+        Executor side: (path, bytes) -> rows,
+        typed by the slicer (see SCHEMA). A file
+        that fails to parse is logged and skipped.
+    '''
+    for path, content in files:
+        keys = _get_file_keys(path, fid_dict, path_map)
+        if not keys: continue
+        lines = content.decode("utf-8", errors="replace").splitlines(keepends=True)
+        for fid, trade_date in keys:
+            if trade_date is not None: trade_date = datetime.date.fromisoformat(trade_date)
+            data_sets = fid_dict[fid]
+            try:
+                section_lines = _scan_report_lines(lines, data_sets, search_footer_str="TOTAL", source=path)
+            except ValueError as e:
+                logger.error("Skipping %s (%s): %s", path, fid, e)
+                continue
+            for data_set, df in _sections_to_dfs(section_lines, data_sets).items():
+                for row in _get_section_rows(df):
+                    yield (trade_date, fid, data_set) + row
+
+def parse_reports_on_spark(spark, paths, fid_dict, num_partitions=None, path_map=None):
+    '''
+        paths: a path, glob or list of them.
+        path_map: {file name: [(fid, trade_date)]}
+        (get_cache_path_map for cache blobs);
+        files not in it are matched by name (see
+        Notes). Files with no fid are skipped.
+        Returns one DataFrame with TRADE_DATE,
+        FID, DATA_SET and the 11 report columns.
+    '''
+    if not isinstance(paths, str): paths = ",".join(paths)
+    sc = spark.sparkContext
+    files = sc.binaryFiles(paths, minPartitions=num_partitions or sc.defaultParallelism)
+    fid_dict_bc = sc.broadcast(dict(fid_dict))
+    path_map_bc = sc.broadcast(path_map or {})
+    rows = files.mapPartitions(lambda part: _parse_partition(part, fid_dict_bc.value, path_map_bc.value))
+    return spark.createDataFrame(rows, schema=SCHEMA)
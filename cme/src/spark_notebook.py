@@ -5,64 +5,22 @@
 # For synapse.
 ####################################
 
-import numpy as np
-import pandas as pd
-import requests
 from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from common.src.synapse_upsert import upsert_with_merge
+from common.src.synapse_read import read_table
 
-data = {"Data_Set":["26 Crude Oil Last Day Financial Futures",
-                    "B0 Mont Belvieu LDH Propane (OPIS) Futures",
-                    "BZ Brent Crude Oil Last Day Financial Futures",
-                    "C0 Mont Belvieu Ethane (OPIS) Futures",
-                    "C1 Canadian Dollar/U.S. Dollar (CAD/USD) Futures",
-                    "EC Euro/U.S. Dollar (EUR/USD) Futures",
-                    "NG Henry Hub Natural Gas Futures"],
-        "Month":["JAN25", "NOV24", "JAN25", "NOV24", "DEC24", "DEC24", "JAN25"],
-        "Settlement_Price":[68.72000, 0.80444, 72.94, 0.19911, 0.7147, 1.05735, 3.363],
-        "Last_Price":[np.NaN, np.NaN, 72.94, np.NaN, 0.7147, 1.05835, 3.368]
-        }
-df = pd.DataFrame(data=data)
+# Parquet handoff written by: python -m cme.src.pull_cme_data --parquet-dir <parquet_path>
+# Partitioned by Date and Product_Key (the registry's sql_column). A full ADLS URI:
+# Spark resolves a relative path on the default filesystem, not the driver's disk.
+storage_account = "<storage account>"
+container = "<container>"
+parquet_path = f"abfss://{container}@{storage_account}.dfs.core.windows.net/cme_parquet"
 
 ####################################
 ####################################
 ####################################
 
-def transform_df_for_azure_upsert(df):
-
-    def _set_short_names(data_set):
-        def __take_inverse(num: float) -> float:
-            if num != 0.0:
-                return 1/num;
-            else: return num
-        df = pd.DataFrame({});
-        for n, data in enumerate(data_set):
-            if data[1] == "26 Crude Oil Last Day Financial Futures":
-                df["WTI Crude Oil"] = [data[3]] # Settlement
-            elif data[1] == "B0 Mont Belvieu LDH Propane (OPIS) Futures":
-                df["Propane"] = [data[3]] # Settlement
-            elif data[1]  == "BZ Brent Crude Oil Last Day Financial Futures":
-                df["Brent Crude Oil"] = [data[3]] # Settlement
-            elif data[1]  == "C0 Mont Belvieu Ethane (OPIS) Futures":
-                df["Ethane"] = [data[3]] # Settlement
-            elif data[1]  == "C1 Canadian Dollar/U.S. Dollar (CAD/USD) Futures":
-                df["US to CA$"] = [__take_inverse(float(data[4]))] # Last
-            elif data[1]  == "EC Euro/U.S. Dollar (EUR/USD) Futures":
-                df["Euro to $US"] = [data[4]] # Last
-            elif data[1]  == "NG Henry Hub Natural Gas Futures":
-                df["Nat. Gas"] = [data[3]] # Settlement
-        return df
-
-    records = df.to_records();
-    df = _set_short_names(records)
-    return df
-
-####################################
-####################################
-####################################
-
-# Transform df:
-df_ = transform_df_for_azure_upsert(df)
-
 # Define connection string parameters:
 synapse_host = "rti-synapse-db.sql.azuresynapse.net"
 port = 1433
@@ -84,55 +42,41 @@ jdbc_url = f"jdbc:sqlserver://{synapse_host}:{port};database={db_name};encrypt=t
 
 # Define PySpark dataframe:
 spark = SparkSession.builder.appName("ReadWriteToSynapseSQL").getOrCreate()
-df_spark = spark.createDataFrame(df_)
 
-# Define Read (here for reference):
-# df_jdbc = spark.read \
-# .format("jdbc") \
-# .option("url", jdbc_url) \
-# .option("accessToken", sql_access_token) \
-# .option("dbtable", db_table) \
-# .load()
+# Front month of the latest Date, one row per product (Product_Key is the sql name):
+df_prices = spark.read.parquet(parquet_path).filter(F.col("Curve_Position") == 1)
+latest_date = df_prices.agg(F.max("Date")).first()[0]
+df_spark = df_prices.filter(F.col("Date") == latest_date) \
+    .select(F.col("Date").cast("date").alias("date"), F.col("Product_Key").alias("product"),
+            F.col("Month").alias("month"), F.col("Price").alias("price"))
+
+# Define Read (here for reference): filters and columns are pushed down, the scan is split by date.
+# df_jdbc = read_table(spark, jdbc_url, sql_access_token, db_table, columns=None, date_column="date", num_partitions=8)
 
 ####################################
 ####################################
 ####################################
 
-# Write PySpark DataFrame into Synapse:
-
-db_table2 = "stg.Test_RTiPetchem_SO2"
+# Upsert PySpark DataFrame into Synapse (stage in bulk, then MERGE on date and product):
 
-df_spark = df_spark \
-    .withColumnRenamed("WTI Crude Oil", "wti_crude_oil") \
-    .withColumnRenamed("Propane", "propane") \
-    .withColumnRenamed("Brent Crude Oil", "brent_crude_oil") \
-    .withColumnRenamed("Ethane", "ethane") \
-    .withColumnRenamed("US to CA$", "usd2cad") \
-    .withColumnRenamed("Euro to $US", "euro2usd") \
-    .withColumnRenamed("Nat. Gas", "nat_gas") \
+db_table2 = "stg.Test_RTiPetchem_Settlements"
 
-col_str = "wti_crude_oil FLOAT, propane FLOAT, brent_crude_oil FLOAT, ethane FLOAT, usd2cad FLOAT, euro2usd FLOAT, nat_gas FLOAT"
+col_str = "date DATE, product VARCHAR(64), month VARCHAR(16), price FLOAT" # Spark SQL types
 
 ####################################
 ####################################
 ####################################
 
-df_spark.write \
-    .format("jdbc") \
-    .option("url", jdbc_url) \
-    .option("dbtable", db_table2) \
-    .option("accessToken", sql_access_token) \
-    .option("createTableColumnTypes", col_str) \
-    .option("encrypt", "true") \
-    .mode("overwrite") \
-    .save() # could also append.
+upsert_with_merge(spark, df_spark, jdbc_url, sql_access_token, db_table2,
+                  key_columns=["date", "product"], batch_size=10000, num_partitions=4,
+                  create_table_column_types=col_str)
 
-df_jdbc = spark.read \
-.format("jdbc") \
-.option("url", jdbc_url) \
-.option("accessToken", sql_access_token) \
-.option("dbtable", "stg.Test_RTiPetchem_SO2") \
-.load()
+# History read: only the needed columns and dates, one date range per executor task.
+history_start = "2024-01-01"
+df_jdbc = read_table(spark, jdbc_url, sql_access_token, db_table2,
+                     columns=["date", "product", "price"], date_column="date", start=history_start,
+                     filters={"product":[r["product"] for r in df_spark.select("product").distinct().collect()]},
+                     num_partitions=8)
 
 ####################################
 ####################################
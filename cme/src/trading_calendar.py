@@ -0,0 +1,165 @@
+####################################
+# Notes: CME/NYMEX settlement calendar.
+# Rule-based; no settlement file is published
+# on these exchange holidays:
+# New Year's, MLK, Presidents, Good Friday, Memorial,
+# Juneteenth (2022+), Independence, Labor, Thanksgiving, Christmas.
+# Ad-hoc closures go in extra_holidays.
+# publish_hour is in exchange time (America/Chicago);
+# naive datetimes are taken as this machine's time.
+####################################
+
+import bisect
+import datetime
+import threading
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+EXCHANGE_TZ = "America/Chicago"
+# Settlement files are normally on Datamine by early evening, exchange time.
+DEFAULT_PUBLISH_HOUR = 18
+
+
+def _nth_weekday(year, month, weekday, n):
+    ''' n-th weekday of month; n=-1 is the last one. '''
+    if n > 0:
+        first = datetime.date(year, month, 1)
+        offset = (weekday - first.weekday()) % 7
+        return first + datetime.timedelta(days=offset + 7*(n-1))
+    else:
+        next_month = datetime.date(year + month//12, month % 12 + 1, 1)
+        last = next_month - datetime.timedelta(days=1)
+        offset = (last.weekday() - weekday) % 7
+        return last - datetime.timedelta(days=offset)
+
+def _easter_sunday(year):
+    ''' Anonymous Gregorian computus. '''
+    a = year % 19; b = year // 100; c = year % 100
+    d = b // 4; e = b % 4; f = (b + 8) // 25
+    g = (b - f + 1) // 3; h = (19*a + b - d - g + 15) % 30
+    i = c // 4; k = c % 4; l = (32 + 2*e + 2*i - h - k) % 7
+    m = (a + 11*h + 22*l) // 451
+    month = (h + l - 7*m + 114) // 31
+    day = ((h + l - 7*m + 114) % 31) + 1
+    return datetime.date(year, month, day)
+
+def _observed(date):
+    ''' Saturday holidays move to Friday, Sunday holidays to Monday. '''
+    if date.weekday() == 5: return date - datetime.timedelta(days=1)
+    if date.weekday() == 6: return date + datetime.timedelta(days=1)
+    return date
+
+def _to_exchange_time(as_of):
+    try: return as_of.astimezone(ZoneInfo(EXCHANGE_TZ))
+    except ZoneInfoNotFoundError: return as_of # no tz database; publish_hour is then local.
+
+@lru_cache(maxsize=None)
+def get_exchange_holidays(year):
+    ''' Set of CME/NYMEX settlement holidays for a year. '''
+    holidays = set()
+
+    # New Year's on a Saturday is not observed on the prior Friday.
+    new_years = datetime.date(year, 1, 1)
+    if new_years.weekday() != 5: holidays.add(_observed(new_years))
+
+    holidays.add(_nth_weekday(year, 1, 0, 3))                           # MLK
+    holidays.add(_nth_weekday(year, 2, 0, 3))                           # Presidents
+    holidays.add(_easter_sunday(year) - datetime.timedelta(days=2))     # Good Friday
+    holidays.add(_nth_weekday(year, 5, 0, -1))                          # Memorial
+    if year >= 2022: holidays.add(_observed(datetime.date(year, 6, 19)))  # Juneteenth
+    holidays.add(_observed(datetime.date(year, 7, 4)))                  # Independence
+    holidays.add(_nth_weekday(year, 9, 0, 1))                           # Labor
+    holidays.add(_nth_weekday(year, 11, 3, 4))                          # Thanksgiving
+    holidays.add(_observed(datetime.date(year, 12, 25)))                # Christmas
+    return frozenset(holidays)
+
+
+class TradingCalendar:
+    '''
+        Precomputed trading days. Every calendar
+        day in the window maps to its last trading
+        day so lookups are a dict hit.
+    '''
+
+    def __init__(self, start_year=None, end_year=None, extra_holidays=()):
+        today = datetime.date.today()
+        self.start_year = start_year or today.year - 5
+        self.end_year = end_year or today.year + 1
+        self.extra_holidays = frozenset(extra_holidays)
+        self._lock = threading.Lock()   # downloads share one calendar across threads.
+        self._build()
+
+    def _build(self):
+        self.holidays = set(self.extra_holidays)
+        for year in range(self.start_year, self.end_year + 1):
+            self.holidays.update(get_exchange_holidays(year))
+
+        self.trading_days = []
+        self._last_trading_day = {}     # date -> last trading day on or before.
+        self._trading_day_index = {}    # trading day -> position in trading_days.
+        day = datetime.date(self.start_year, 1, 1)
+        end = datetime.date(self.end_year, 12, 31)
+        last = None
+        while day <= end:
+            if self._is_trading_day(day):
+                self._trading_day_index[day] = len(self.trading_days)
+                self.trading_days.append(day)
+                last = day
+            if last is not None: self._last_trading_day[day] = last
+            day += datetime.timedelta(days=1)
+
+    def _is_trading_day(self, date):
+        return date.weekday() < 5 and date not in self.holidays
+
+    def _as_date(self, date):
+        if isinstance(date, datetime.datetime): date = date.date()
+        if date.year <= self.start_year or date.year > self.end_year:
+            # Grow the window rather than fail on long backfills.
+            with self._lock:
+                self.start_year = min(self.start_year, date.year - 1)
+                self.end_year = max(self.end_year, date.year)
+                self._build()
+        return date
+
+    def is_trading_day(self, date):
+        date = self._as_date(date)
+        return date in self._trading_day_index
+
+    def last_trading_day(self, date):
+        ''' Last trading day on or before date. '''
+        date = self._as_date(date)
+        return self._last_trading_day[date]
+
+    def previous_trading_days(self, date, n):
+        ''' Last n trading days on or before date, most recent first. '''
+        date = self._as_date(date)
+        i = self._trading_day_index[self.last_trading_day(date)]
+        if i + 1 < n:
+            with self._lock:
+                self.start_year -= (n // 250) + 1
+                self._build()
+            i = self._trading_day_index[self.last_trading_day(date)]
+        return self.trading_days[i-n+1:i+1][::-1]
+
+    def trading_days_between(self, start_date, end_date):
+        ''' Trading days in [start_date, end_date], ascending. '''
+        start_date = self._as_date(start_date); end_date = self._as_date(end_date)
+        i = bisect.bisect_left(self.trading_days, start_date)
+        j = bisect.bisect_right(self.trading_days, end_date)
+        return self.trading_days[i:j]
+
+    def last_settlement_date(self, as_of=None, publish_hour=None):
+        '''
+            Trade date of the most recent settlement
+            file. With publish_hour set, a trading day
+            before that hour (exchange time) resolves
+            to the prior trading day (file not yet
+            published).
+        '''
+        as_of = as_of or datetime.datetime.now()
+        if publish_hour is not None and isinstance(as_of, datetime.datetime): as_of = _to_exchange_time(as_of)
+        date = self.last_trading_day(as_of)
+        if (publish_hour is not None and isinstance(as_of, datetime.datetime)
+                and date == as_of.date() and as_of.hour < publish_hour):
+            date = self.previous_trading_days(date - datetime.timedelta(days=1), 1)[0]
+        return date
@@ -0,0 +1,80 @@
+####################################
+# Notes: Fast-start entry point for short cron and
+# container jobs. By default the pull goes through the
+# lean record paths (CMEDatamineAPI.get_price_records,
+# eiaapi.get_records) and prints plain records as JSON
+# lines or CSV: no DataFrame is built and pandas is
+# never imported. --frame prints the usual df instead,
+# and --parquet-dir writes it; pandas (and pyarrow for
+# Parquet) are only imported on those paths.
+#
+#   python -m common.src.cli cme
+#   python -m common.src.cli eia --format csv
+#   python -m common.src.cli cme --forward-curve --parquet-dir cme_parquet
+####################################
+
+import os, sys, csv, json, argparse, logging
+
+logger = logging.getLogger(__name__)
+
+
+def write_records(records, output_format="json", out=None):
+    ''' JSON lines, or CSV headed by every key seen (first-seen order). '''
+    out = out or sys.stdout
+    if output_format == "json":
+        for record in records: out.write(json.dumps(record) + "\n")
+        return
+    writer = csv.DictWriter(out, fieldnames=list(dict.fromkeys(k for record in records for k in record)), lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(records)
+
+def run_cme(args):
+    '''
+        Records, or the upsert df with --frame or
+        --parquet-dir (CME_USE_BATCH is only used on
+        the frame path).
+    '''
+    from cme.src.pull_cme_data import CMEDatamineAPI, FID_DICT
+    cme = CMEDatamineAPI(cache_dir=os.environ.get("CME_CACHE_DIR"))
+    if not (args.frame or args.parquet_dir):
+        return cme, cme.get_price_records(FID_DICT, forward_curve=args.forward_curve, max_workers=len(FID_DICT))
+
+    df = cme.get_clean_df(FID_DICT, forward_curve=args.forward_curve, use_batch=bool(os.environ.get("CME_USE_BATCH")))
+    if args.parquet_dir: cme.write_parquet(df, args.parquet_dir)
+    return cme, cme.transform_df_for_azure_upsert(df, forward_curve=args.forward_curve)
+
+def run_eia(args):
+    '''
+        Records, or get_data()'s df with --frame or
+        --parquet-dir (EIA_SYNC_DIR is only used on
+        the frame path).
+    '''
+    from eia.src.pull_eia_data import eiaapi
+    if not (args.frame or args.parquet_dir):
+        eia = eiaapi()
+        return eia, eia.get_records()
+
+    eia = eiaapi(sync_dir=os.environ.get("EIA_SYNC_DIR"))
+    df = eia.get_data()
+    if args.parquet_dir: eia.write_parquet(df, args.parquet_dir)
+    return eia, df
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pull the latest CME or EIA numbers; pandas is only loaded for frame output.")
+    parser.add_argument("source", choices=["cme", "eia"])
+    parser.add_argument("--format", dest="output_format", choices=["json", "csv"], default="json", help="Record output (default JSON lines).")
+    parser.add_argument("--frame", action="store_true", help="Print the DataFrame from the usual path instead of records.")
+    parser.add_argument("--parquet-dir", help="Also write Parquet (implies --frame; needs pandas and pyarrow).")
+    parser.add_argument("--forward-curve", action="store_true", help="CME: every contract month, long form.")
+    args = parser.parse_args(argv)
+
+    api, result = (run_cme if args.source == "cme" else run_eia)(args)
+    api.metrics.emit()
+    if isinstance(result, list): write_records(result, args.output_format)
+    else: print(result)
+    return 0
+
+if __name__ == "__main__":
+    # Quiet by default; LOG_LEVEL=INFO adds request status and the metrics summary.
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    sys.exit(main())
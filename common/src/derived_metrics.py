@@ -0,0 +1,110 @@
+####################################
+# Notes: Derived series over the stored history. One
+# entry per series, per dataset; inputs are stored
+# series (CME product short names, EIA areas) or
+# derived series declared above them.
+#   op: spread   a - b
+#       ratio    scale*a/b
+#       product  a*b (FX conversion)
+#       linear   sum(weights*inputs) (crack-style)
+#       rolling_mean / rolling_vol over window rows
+#       (vol: stdev of log returns, annualized).
+# Every op is a column operation on the date x series
+# frame. update_derived only recomputes dates after
+# the last stored derived date (plus the rolling
+# lookback they need) and stores them as
+# "<dataset>_derived".
+####################################
+
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DERIVED_SERIES = {
+    "cme": {
+        "Brent-WTI Spread":       {"op":"spread",  "inputs":["Brent Crude Oil", "WTI Crude Oil"]},
+        "Propane/Ethane Ratio":   {"op":"ratio",   "inputs":["Propane", "Ethane"]},
+        "Propane/WTI Ratio":      {"op":"ratio",   "inputs":["Propane", "WTI Crude Oil"], "scale":42.0},  # $/gal -> $/bbl
+        "Ethane Frac Spread":     {"op":"linear",  "inputs":["Ethane", "Nat. Gas"], "weights":[1.0, -0.066]},  # $/gal less gas at 0.066 MMBtu/gal
+        "WTI Crude Oil (EUR)":    {"op":"ratio",   "inputs":["WTI Crude Oil", "Euro to $US"]},
+        "Brent Crude Oil (CAD)":  {"op":"product", "inputs":["Brent Crude Oil", "US to CA$"]},
+        "Brent-WTI Spread 20D":   {"op":"rolling_mean", "inputs":["Brent-WTI Spread"], "window":20},
+        "WTI Crude Oil Vol 20D":  {"op":"rolling_vol",  "inputs":["WTI Crude Oil"], "window":20, "periods_per_year":252},
+    },
+    "eia": {
+        "PADD3-U.S. Spread":      {"op":"spread",  "inputs":["PADD3", "U.S."]},
+        "U.S. 4W Avg":            {"op":"rolling_mean", "inputs":["U.S."], "window":4},
+        "PADD3 4W Avg":           {"op":"rolling_mean", "inputs":["PADD3"], "window":4},
+    },
+}
+
+def _rolling_mean(x, window):
+    return x.rolling(window, min_periods=window).mean()
+
+def _rolling_vol(x, window, periods_per_year=252):
+    log_returns = np.log(x.where(x > 0)).diff()
+    return log_returns.rolling(window, min_periods=window).std()*np.sqrt(periods_per_year)
+
+OPS = {
+    "spread":       lambda xs, d: xs[0] - xs[1],
+    "ratio":        lambda xs, d: d.get("scale", 1.0)*xs[0]/xs[1].where(xs[1] != 0),
+    "product":      lambda xs, d: xs[0]*xs[1],
+    "linear":       lambda xs, d: sum(w*x for w, x in zip(d["weights"], xs)),
+    "rolling_mean": lambda xs, d: _rolling_mean(xs[0], d["window"]),
+    "rolling_vol":  lambda xs, d: _rolling_vol(xs[0], d["window"], d.get("periods_per_year", 252)),
+}
+
+
+def get_lookback(definitions):
+    ''' Rows of history a new date needs (rolling windows chain through derived inputs). '''
+    lookback = {}
+    for name, d in definitions.items():
+        own = d.get("window", 0) + (1 if d["op"] == "rolling_vol" else 0)
+        lookback[name] = own + max((lookback.get(i, 0) for i in d["inputs"]), default=0)
+    return max(lookback.values(), default=0)
+
+def compute_derived(df, definitions, date_column="Date"):
+    '''
+        df: one row per date, one column per series.
+        Returns date_column plus one column per
+        derived series whose inputs are present,
+        oldest date first.
+    '''
+    frame = df.sort_values(date_column).reset_index(drop=True)
+    values = frame.drop(columns=[date_column]).astype(float)
+    out = pd.DataFrame({date_column:frame[date_column]})
+    for name, d in definitions.items():
+        missing = [i for i in d["inputs"] if i not in values.columns]
+        if missing:
+            logger.debug("Skipping %s: no input(s) %s.", name, missing)
+            continue
+        values[name] = OPS[d["op"]]([values[i] for i in d["inputs"]], d)
+        out[name] = values[name]
+    return out
+
+def update_derived(store, dataset, definitions=None, full=False):
+    '''
+        Computes the derived series for dates newer
+        than the last stored "<dataset>_derived" date
+        (every date with full=True) from the stored
+        history, writes them and returns those rows.
+    '''
+    definitions = definitions if definitions is not None else DERIVED_SERIES.get(dataset, {})
+    derived_dataset = f"{dataset}_derived"
+    history = store.get_history(dataset)
+    if history.empty or not definitions: return pd.DataFrame({"Date":[]})
+    history = history.sort_values("Date").reset_index(drop=True)
+
+    last_date = None if full else store.get_latest_date(derived_dataset)
+    if last_date is not None:
+        n_new = int((history["Date"] > last_date).sum())
+        if n_new == 0: return pd.DataFrame({"Date":[]})
+        history = history.iloc[-(n_new + get_lookback(definitions)):]
+
+    derived = compute_derived(history, definitions)
+    if last_date is not None: derived = derived[derived["Date"] > last_date]
+    n_changed = store.write(derived_dataset, derived)
+    logger.info("%s: %d date(s) computed, %d value(s) stored.", derived_dataset, len(derived), n_changed)
+    return derived.reset_index(drop=True)
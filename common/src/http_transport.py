@@ -0,0 +1,145 @@
+####################################
+# Notes: One HTTP transport for Datamine and EIA.
+# A single requests.Session with a pooled adapter, so
+# connections (and TLS sessions) are reused across
+# fids, date probes, pages and threads; gzip is asked
+# for on every call.
+# Each host has a token bucket (rate/s, burst). Retries
+# are done here, not by urllib3: a 429 pauses the
+# host's bucket for Retry-After (or the backoff), and a
+# 5xx or connection error pauses it for an exponential
+# backoff with full jitter, so every worker on that
+# host waits together instead of retrying in lockstep.
+####################################
+
+import time, random, logging
+import threading
+import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        ''' Blocks until a token is free and the bucket is not paused. '''
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    if self.rate is None: return
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated)*self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens)/self.rate
+                else:
+                    wait = self._paused_until - now
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        ''' Holds every caller for seconds (the longest pause wins). '''
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._updated = self._paused_until
+
+
+def _get_retry_after(response):
+    ''' Retry-After in seconds (delta or HTTP date), or None. '''
+    value = response.headers.get("Retry-After")
+    if not value: return None
+    if value.strip().isdigit(): return float(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class HTTPTransport:
+
+    def __init__(self, rate=5.0, burst=10, host_rates=None, max_retries=4, backoff_base=0.5, backoff_max=60.0,
+                 pool_maxsize=16, timeout=(10, 300)):
+        '''
+            rate/burst: default per-host token bucket
+            (rate=None for no limit); host_rates
+            overrides it per host: {host: (rate, burst)}.
+            timeout: (connect, read) seconds per call.
+        '''
+        self.rate = rate
+        self.burst = burst
+        self.host_rates = dict(host_rates or {})
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding":"gzip, deflate", "Connection":"keep-alive"})
+
+    def get_bucket(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(*self.host_rates.get(host, (self.rate, self.burst)))
+            return self._buckets[host]
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base*2**attempt))
+
+    def get(self, url, metrics=None, **kwargs):
+        '''
+            session.get through the host's bucket, with
+            shared retries on 429/5xx and connection
+            errors. Returns the last response (possibly
+            a retry status once retries run out).
+        '''
+        kwargs.setdefault("timeout", self.timeout)
+        bucket = self.get_bucket(urlparse(url).netloc)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries: raise
+                delay = self._backoff(attempt)
+                logger.info("Connection error on %s (%s); retry in %.1fs.", url, e, delay)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries: return response
+                retry_after = _get_retry_after(response)
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                if response.status_code == 429 and metrics is not None: metrics.incr("throttled")
+                logger.info("HTTP %s on %s; retry in %.1fs.", response.status_code, url, delay)
+                response.close()
+            if metrics is not None: metrics.incr("retries")
+            bucket.pause(delay)
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+def get_default_transport():
+    ''' Process-wide transport shared by CMEDatamineAPI and eiaapi. '''
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None: _default_transport = HTTPTransport()
+        return _default_transport
@@ -0,0 +1,33 @@
+####################################
+# Notes: Small JSON state files (cache and section
+# indexes, checkpoints, watermarks, watch state).
+# save_json writes a temp file next to the target and
+# os.replace()s it in, so a reader or a crash sees the
+# old file or the new one, never half of one.
+# load_json treats a missing or corrupt file as the
+# default; every caller can rebuild its state.
+####################################
+
+import os, json, tempfile
+
+
+def load_json(path, default):
+    ''' Contents of path, or default when it is missing or unreadable. '''
+    if not os.path.exists(path): return default
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def save_json(path, obj, **dump_kwargs):
+    ''' Atomic replace of path with obj; dump_kwargs go to json.dump. '''
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".json")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(obj, f, **dump_kwargs)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
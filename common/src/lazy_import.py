@@ -0,0 +1,34 @@
+####################################
+# Notes: Deferred imports for the heavy libraries.
+#   pd = lazy_import("pandas")
+# binds a stand-in at module load; pandas is imported
+# on the first pd.<attr>, so code paths that never
+# build a frame (common/src/cli.py) never pay for it.
+####################################
+
+import sys, importlib
+import threading
+
+
+class LazyModule:
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None: self.__dict__["_module"] = importlib.import_module(self._name)
+            return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._module or self._load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}{'' if self._module is None else ' (loaded)'}>"
+
+
+def lazy_import(name):
+    ''' The module if it is already imported, else a LazyModule for it. '''
+    return sys.modules.get(name) or LazyModule(name)
@@ -0,0 +1,83 @@
+####################################
+# Notes: Per-stage timing and counters shared by the
+# CME and EIA pulls. Quiet by default: everything goes
+# through logging (DEBUG per stage, one INFO summary
+# from emit()); nothing prints.
+#   stages:   download, section_search, parse, clean,
+#             transform, write -> calls and seconds.
+#   counters: bytes_downloaded, retries, requests, ...
+#   sections: rows per report section.
+# profile_hook(stage, seconds, labels) is called after
+# every stage, e.g. to feed a tracer or a profiler.
+####################################
+
+import json, time, logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineMetrics:
+
+    def __init__(self, name="pipeline", profile_hook=None):
+        self.name = name
+        self.profile_hook = profile_hook
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+            self.sections = {}
+
+    @contextmanager
+    def stage(self, name, **labels):
+        ''' Times the block; nested and concurrent stages are each counted. '''
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - t0
+            with self._lock:
+                entry = self.stages.setdefault(name, {"calls":0, "seconds":0.0})
+                entry["calls"] += 1
+                entry["seconds"] += seconds
+            logger.debug("%s stage=%s seconds=%.4f %s", self.name, name, seconds, labels or "")
+            if self.profile_hook is not None: self.profile_hook(name, seconds, labels)
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_section(self, data_set, n_rows):
+        with self._lock:
+            self.sections[data_set] = self.sections.get(data_set, 0) + n_rows
+
+    def count_bytes(self, chunks, name="bytes_downloaded"):
+        ''' Passes chunks through, adding their size to counter name. '''
+        for chunk in chunks:
+            self.incr(name, len(chunk))
+            yield chunk
+
+    def record_response(self, response):
+        '''
+            Counts a completed request. Retries are
+            counted by HTTPTransport.get, which does
+            the retrying (urllib3's are disabled).
+        '''
+        self.incr("requests")
+
+    def snapshot(self):
+        with self._lock:
+            return {"name":self.name,
+                    "stages":{k:dict(v) for k, v in self.stages.items()},
+                    "counters":dict(self.counters),
+                    "sections":dict(self.sections)}
+
+    def emit(self, level=logging.INFO):
+        ''' One structured (JSON) log line with everything recorded so far. '''
+        snapshot = self.snapshot()
+        logger.log(level, "metrics %s", json.dumps(snapshot, sort_keys=True))
+        return snapshot
@@ -0,0 +1,27 @@
+####################################
+# Notes: Parquet handoff shared by the CME and EIA
+# pulls. Hive-style partitions (<col>=<value>/) so
+# spark.read.parquet picks up the partition columns.
+# pyarrow is only needed when writing. output_dir may
+# be a local path or a URI pyarrow can open (e.g.
+# abfss://... for the Synapse notebooks).
+####################################
+
+
+def write_partitioned_parquet(df, output_dir, partition_cols, compression="snappy"):
+    '''
+        Writes df under output_dir, one directory
+        level per partition column. Partitions in
+        df replace any already on disk, so reruns
+        of a day do not duplicate rows.
+    '''
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow") from e
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(table, root_path=output_dir, partition_cols=list(partition_cols),
+                        compression=compression, existing_data_behavior="delete_matching")
+    return output_dir
@@ -0,0 +1,137 @@
+####################################
+# Notes: One entry point for the CME and EIA pulls.
+# Both run as tasks in a TaskGraph, so the Datamine
+# and EIA fetches overlap; the upsert-shaped frames go
+# to one sink and the Parquet writes hang off the
+# fetches. Exit code is 1 if any task failed or was
+# skipped, with every task's status in the log.
+# With --store, the frames go through the local
+# TimeSeriesStore and only the new or changed rows
+# (<dataset>_delta) are sunk; they are marked
+# published once the sink has taken them, and the
+# derived series (<dataset>_derived, see
+# derived_metrics.py) are updated for the new dates.
+# The CME forward curve (one series per contract
+# month) is its own dataset, cme_curve, with no
+# derived series.
+#
+#   python -m common.src.run_pipelines --output-dir out \
+#       --cme-parquet-dir cme_parquet --eia-parquet-dir eia_parquet
+####################################
+
+import os, sys, argparse, logging
+
+from common.src.task_graph import TaskGraph, MemorySink, DirectorySink, SUCCEEDED
+from common.src.timeseries_store import TimeSeriesStore
+from common.src.derived_metrics import update_derived
+
+logger = logging.getLogger(__name__)
+
+
+def add_delta_task(graph, store, dataset, source_task, marks, to_long=None, derived=True):
+    '''
+        <dataset>_delta: writes source_task's frame to
+        the store and returns the rows changed since
+        the last publish (sunk). The sequence to mark
+        is left in marks[dataset].
+        <dataset>_derived: derived series for the new
+        dates (sunk; only if derived).
+    '''
+    def _write_and_get_delta(**kwargs):
+        df = kwargs[source_task]
+        if to_long is None: n_changed = store.write(dataset, df)
+        else: n_changed = store.write_long(dataset, to_long(df))
+        logger.info("%s: %d new or changed row(s) stored.", dataset, n_changed)
+        delta, marks[dataset] = store.get_delta(dataset, wide=to_long is None)
+        return delta
+
+    graph.add_task(f"{dataset}_delta", _write_and_get_delta, deps=[source_task], sink=True)
+    if derived:
+        graph.add_task(f"{dataset}_derived", lambda **kwargs: update_derived(store, dataset), deps=[f"{dataset}_delta"], sink=True)
+    return graph
+
+def build_cme_tasks(graph, cme, fid_dict, forward_curve=False, use_batch=False, parquet_dir=None, timeout=None, retries=0,
+                    store=None, marks=None):
+    '''
+        cme_fetch:   download, parse, clean, rename.
+        cme_prices:  upsert shape (sunk without a store).
+        cme_delta:   changed rows only (with a store;
+                     cme_curve_delta with forward_curve).
+        cme_parquet: Parquet handoff (if parquet_dir).
+    '''
+    # A timed-out attempt keeps running (see task_graph.py); each attempt gets its own API object.
+    graph.add_task("cme_fetch", lambda: cme.clone().get_clean_df(fid_dict, forward_curve=forward_curve, use_batch=use_batch),
+                   timeout=timeout, retries=retries)
+    graph.add_task("cme_prices", lambda cme_fetch: cme.transform_df_for_azure_upsert(cme_fetch, forward_curve=forward_curve),
+                   deps=["cme_fetch"], sink=store is None)
+    if store is not None and forward_curve:
+        # Long form, each contract month its own series; kept apart from the
+        # front-month "cme" dataset, which the derived metrics read.
+        to_long = lambda df: df.assign(series=df["Product"] + " " + df["Month"].astype(str))[["Date", "series", "Price"]] \
+            .rename(columns={"Price":"value"})
+        add_delta_task(graph, store, "cme_curve", "cme_prices", marks, to_long=to_long, derived=False)
+    elif store is not None:
+        add_delta_task(graph, store, "cme", "cme_prices", marks)
+    if parquet_dir:
+        graph.add_task("cme_parquet", lambda cme_fetch: cme.write_parquet(cme_fetch, parquet_dir), deps=["cme_fetch"])
+    return graph
+
+def build_eia_tasks(graph, eia, parquet_dir=None, timeout=None, retries=0, store=None, marks=None):
+    '''
+        eia_utilization: fetch and transform (sunk without a store).
+        eia_delta:       changed rows only (with a store).
+        eia_parquet:     Parquet handoff (if parquet_dir).
+    '''
+    graph.add_task("eia_utilization", eia.get_data, timeout=timeout, retries=retries, sink=store is None)
+    if store is not None: add_delta_task(graph, store, "eia", "eia_utilization", marks)
+    if parquet_dir:
+        graph.add_task("eia_parquet", lambda eia_utilization: eia.write_parquet(eia_utilization, parquet_dir), deps=["eia_utilization"])
+    return graph
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the CME and EIA pulls concurrently.")
+    parser.add_argument("--only", choices=["cme", "eia"], action="append", help="Run a subset (repeatable).")
+    parser.add_argument("--output-dir", help="Write each sunk frame to <dir>/<task>.csv.")
+    parser.add_argument("--cme-parquet-dir")
+    parser.add_argument("--eia-parquet-dir")
+    parser.add_argument("--forward-curve", action="store_true", help="Keep every CME contract month.")
+    parser.add_argument("--publish-hour", type=int, help="Exchange-time hour the CME settlement files are up (default CME_PUBLISH_HOUR or 18).")
+    parser.add_argument("--timeout", type=float, default=900, help="Seconds before a fetch attempt is abandoned and retried (it is not killed).")
+    parser.add_argument("--retries", type=int, default=1, help="Extra attempts per fetch.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--store", default=os.environ.get("TIMESERIES_DB"), help="SQLite history; only changed rows are sunk.")
+    args = parser.parse_args(argv)
+    only = set(args.only or ["cme", "eia"])
+
+    sink = DirectorySink(args.output_dir) if args.output_dir else MemorySink()
+    graph = TaskGraph(max_workers=args.workers, sink=sink)
+    store = TimeSeriesStore(args.store) if args.store else None
+    marks = {}
+    apis = []
+    if "cme" in only:
+        from cme.src.pull_cme_data import CMEDatamineAPI, FID_DICT
+        cme = CMEDatamineAPI(publish_hour=args.publish_hour, cache_dir=os.environ.get("CME_CACHE_DIR"))
+        build_cme_tasks(graph, cme, FID_DICT, forward_curve=args.forward_curve, use_batch=bool(os.environ.get("CME_USE_BATCH")),
+                        parquet_dir=args.cme_parquet_dir, timeout=args.timeout, retries=args.retries, store=store, marks=marks)
+        apis.append(cme)
+    if "eia" in only:
+        from eia.src.pull_eia_data import eiaapi
+        eia = eiaapi(sync_dir=os.environ.get("EIA_SYNC_DIR"))
+        build_eia_tasks(graph, eia, parquet_dir=args.eia_parquet_dir, timeout=args.timeout, retries=args.retries, store=store, marks=marks)
+        apis.append(eia)
+
+    results = graph.run()
+    for dataset, seq in marks.items():
+        if results[f"{dataset}_delta"].status == SUCCEEDED: store.mark_published(dataset, seq)
+    for api in apis: api.metrics.emit()
+    graph.metrics.emit()
+    for task_result in results.values():
+        logger.log(logging.INFO if task_result.status == SUCCEEDED else logging.ERROR, "%r", task_result)
+    for name, df in sink.results.items():
+        print(name); print(df)
+    return 0 if all(r.status == SUCCEEDED for r in results.values()) else 1
+
+if __name__ == "__main__":
+    # Quiet by default; LOG_LEVEL=INFO adds task status and the metrics summaries.
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    sys.exit(main())
@@ -0,0 +1,84 @@
+####################################
+# Notes: Partitioned JDBC reads of Synapse history.
+# Only the requested columns and rows are selected
+# (date range and IN filters are pushed into the SQL),
+# and the scan is split into num_partitions date
+# ranges (partitionColumn/lowerBound/upperBound), one
+# JDBC connection per executor task. Bounds default
+# to MIN/MAX of the date column inside the filters.
+####################################
+
+import datetime
+
+from common.src.synapse_upsert import _quote_table, _quote
+
+
+def _literal(value):
+    ''' SQL literal: numbers as is, dates/strings quoted with '' escaping. '''
+    if isinstance(value, bool): return "1" if value else "0"
+    if isinstance(value, (int, float)): return repr(value)
+    if isinstance(value, (datetime.date, datetime.datetime)): value = value.isoformat()
+    return "N'" + str(value).replace("'", "''") + "'"
+
+def build_where(date_column=None, start=None, end=None, filters=None):
+    ''' filters: {column: value or list of values}; an empty list matches nothing. '''
+    clauses = []
+    if date_column and start is not None: clauses.append(f"{_quote(date_column)} >= {_literal(start)}")
+    if date_column and end is not None: clauses.append(f"{_quote(date_column)} <= {_literal(end)}")
+    for column, values in (filters or {}).items():
+        if isinstance(values, (list, tuple, set)) and not values:
+            clauses.append("1 = 0") # IN () is invalid T-SQL.
+        elif isinstance(values, (list, tuple, set)):
+            clauses.append(f"{_quote(column)} IN ({', '.join(_literal(v) for v in values)})")
+        else:
+            clauses.append(f"{_quote(column)} = {_literal(values)}")
+    return " AND ".join(clauses)
+
+def build_select(table, columns=None, where=""):
+    ''' Subquery for the dbtable option. '''
+    select = ", ".join(_quote(c) for c in columns) if columns else "*"
+    sql = f"SELECT {select} FROM {_quote_table(table)}"
+    if where: sql += f" WHERE {where}"
+    return f"({sql}) AS q"
+
+def _jdbc_reader(spark, jdbc_url, access_token, fetch_size):
+    return spark.read \
+        .format("jdbc") \
+        .option("url", jdbc_url) \
+        .option("accessToken", access_token) \
+        .option("encrypt", "true") \
+        .option("fetchsize", fetch_size)
+
+def get_date_bounds(spark, jdbc_url, access_token, table, date_column, where=""):
+    ''' (min, max) of date_column among the filtered rows, as ISO strings; (None, None) if empty. '''
+    sql = f"SELECT MIN({_quote(date_column)}) AS lo, MAX({_quote(date_column)}) AS hi FROM {_quote_table(table)}"
+    if where: sql += f" WHERE {where}"
+    row = _jdbc_reader(spark, jdbc_url, access_token, 1).option("dbtable", f"({sql}) AS b").load().first()
+    if row is None or row["lo"] is None: return None, None
+    return str(row["lo"])[:10], str(row["hi"])[:10]
+
+def read_table(spark, jdbc_url, access_token, table, columns=None, date_column="date", start=None, end=None,
+               filters=None, num_partitions=8, fetch_size=10000):
+    '''
+        Reads table with the date range and filters
+        pushed down and the scan split across
+        num_partitions executor tasks on date_column.
+        columns=None selects every column.
+    '''
+    if columns is not None and date_column not in columns: columns = [date_column] + list(columns)
+    where = build_where(date_column, start, end, filters)
+    reader = _jdbc_reader(spark, jdbc_url, access_token, fetch_size) \
+        .option("dbtable", build_select(table, columns, where))
+
+    if num_partitions > 1:
+        lower, upper = (str(start)[:10] if start is not None else None), (str(end)[:10] if end is not None else None)
+        if lower is None or upper is None:
+            lo, hi = get_date_bounds(spark, jdbc_url, access_token, table, date_column, where)
+            lower, upper = lower or lo, upper or hi
+        if lower is not None and upper is not None and lower < upper:
+            reader = reader \
+                .option("partitionColumn", date_column) \
+                .option("lowerBound", lower) \
+                .option("upperBound", upper) \
+                .option("numPartitions", num_partitions)
+    return reader.load()
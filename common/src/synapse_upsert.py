@@ -0,0 +1,81 @@
+####################################
+# Notes: Keyed upsert into Synapse for the notebooks.
+# The day's rows are bulk written to a stage table
+# (JDBC batchsize, parallel writer partitions), then
+# one MERGE on the key columns applies them to the
+# target. The target is never rewritten in full.
+# SQL runs on the driver through the JVM's JDBC driver
+# with the same access token as the Spark writes.
+####################################
+
+
+def _quote_table(name):
+    ''' schema.table -> [schema].[table] '''
+    return ".".join(f"[{part.strip('[]')}]" for part in name.split("."))
+
+def _quote(column):
+    ''' Columns may hold dots ("U.S."), so they are never split. '''
+    return f"[{column.strip('[]`')}]"
+
+def build_create_target_sql(target_table, stage_table):
+    ''' Empty copy of the stage schema, only if the target does not exist. '''
+    return (f"IF OBJECT_ID(N'{target_table}') IS NULL\n"
+            f"    CREATE TABLE {_quote_table(target_table)} WITH (DISTRIBUTION = ROUND_ROBIN)\n"
+            f"    AS SELECT * FROM {_quote_table(stage_table)} WHERE 1 = 0;")
+
+def build_merge_sql(target_table, stage_table, key_columns, value_columns):
+    ''' MERGE stage into target on key_columns; matched rows get value_columns updated. '''
+    on = " AND ".join(f"t.{_quote(c)} = s.{_quote(c)}" for c in key_columns)
+    columns = list(key_columns) + list(value_columns)
+    insert_columns = ", ".join(_quote(c) for c in columns)
+    insert_values = ", ".join(f"s.{_quote(c)}" for c in columns)
+    sql = (f"MERGE INTO {_quote_table(target_table)} AS t\n"
+           f"USING {_quote_table(stage_table)} AS s\n"
+           f"ON {on}\n")
+    if value_columns:
+        update = ", ".join(f"t.{_quote(c)} = s.{_quote(c)}" for c in value_columns)
+        sql += f"WHEN MATCHED THEN UPDATE SET {update}\n"
+    sql += f"WHEN NOT MATCHED BY TARGET THEN INSERT ({insert_columns}) VALUES ({insert_values});"
+    return sql
+
+def execute_sql(spark, jdbc_url, access_token, *statements):
+    ''' Runs statements in order on one driver-side JDBC connection. '''
+    jvm = spark.sparkContext._gateway.jvm
+    props = jvm.java.util.Properties()
+    props.setProperty("accessToken", access_token)
+    conn = jvm.java.sql.DriverManager.getConnection(jdbc_url, props)
+    try:
+        stmt = conn.createStatement()
+        for sql in statements:
+            stmt.executeUpdate(sql)
+        stmt.close()
+    finally:
+        conn.close()
+
+def upsert_with_merge(spark, df_spark, jdbc_url, access_token, target_table, key_columns,
+                      stage_table=None, batch_size=10000, num_partitions=4, create_table_column_types=None):
+    '''
+        Bulk stage df_spark, then MERGE it into
+        target_table on key_columns. The stage table
+        is overwritten each run (it only holds the
+        day's rows); the target is created on first
+        use.
+    '''
+    stage_table = stage_table or f"{target_table}_stage"
+    value_columns = [c for c in df_spark.columns if c not in key_columns]
+
+    writer = df_spark.repartition(num_partitions).write \
+        .format("jdbc") \
+        .option("url", jdbc_url) \
+        .option("dbtable", stage_table) \
+        .option("accessToken", access_token) \
+        .option("encrypt", "true") \
+        .option("batchsize", batch_size) \
+        .option("numPartitions", num_partitions) \
+        .mode("overwrite")
+    if create_table_column_types: writer = writer.option("createTableColumnTypes", create_table_column_types)
+    writer.save()
+
+    execute_sql(spark, jdbc_url, access_token,
+                build_create_target_sql(target_table, stage_table),
+                build_merge_sql(target_table, stage_table, key_columns, value_columns))
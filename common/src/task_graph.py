@@ -0,0 +1,183 @@
+####################################
+# Notes: Small dependency graph for the pull jobs.
+# Tasks whose dependencies are done run concurrently
+# on one thread pool; each gets the results of its
+# dependencies as keyword arguments (by task name).
+#   timeout: seconds per attempt. Python threads cannot
+#            be killed, so a timed-out attempt is
+#            abandoned (its result ignored) and the
+#            task is retried or failed: timeout decides
+#            when dependents are released or skipped.
+#            It does not bound wall time; the abandoned
+#            attempt runs on and the interpreter waits
+#            for it at exit. Attempts of a task that can
+#            time out must not share mutable state.
+#   retries: extra attempts after an error or timeout.
+#   sink:    sink(name, result) for every successful
+#            task added with sink=True.
+# Dependents of a failed task are skipped; run()
+# reports every task's status, so partial failures
+# are visible.
+####################################
+
+import os, time, logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from common.src.metrics import PipelineMetrics
+
+logger = logging.getLogger(__name__)
+
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class TaskResult:
+
+    def __init__(self, name):
+        self.name = name
+        self.status = None
+        self.result = None
+        self.error = None
+        self.attempts = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return f"TaskResult({self.name!r}, {self.status}, attempts={self.attempts}, seconds={self.seconds:.2f}, error={self.error!r})"
+
+
+class TaskGraph:
+
+    def __init__(self, max_workers=4, sink=None, metrics=None):
+        self.max_workers = max_workers
+        self.sink = sink
+        self.metrics = metrics or PipelineMetrics("tasks")
+        self.tasks = {}
+
+    def add_task(self, name, func, deps=(), timeout=None, retries=0, retry_delay=5.0, sink=False):
+        if name in self.tasks: raise ValueError(f"Duplicate task: {name}")
+        missing = [d for d in deps if d not in self.tasks]
+        if missing: raise ValueError(f"Task {name} depends on unknown task(s): {missing}")
+        self.tasks[name] = {"func":func, "deps":list(deps), "timeout":timeout, "retries":retries,
+                            "retry_delay":retry_delay, "sink":sink}
+        return self
+
+    def _run_attempt(self, name, kwargs):
+        with self.metrics.stage("task", task=name):
+            return self.tasks[name]["func"](**kwargs)
+
+    def run(self):
+        '''
+            Runs every task once its dependencies
+            succeed. Returns {name: TaskResult} in
+            the order the tasks were added.
+        '''
+        results = {name:TaskResult(name) for name in self.tasks}
+        running = {}    # future -> (name, deadline)
+        waiting = {}    # name -> time the next attempt may start
+        started = {}
+        pending = list(self.tasks)
+        executor = ThreadPoolExecutor(max_workers=max(1, self.max_workers))
+
+        def _submit(name):
+            task = self.tasks[name]
+            kwargs = {d:results[d].result for d in task["deps"]}
+            results[name].attempts += 1
+            started.setdefault(name, time.perf_counter())
+            deadline = time.monotonic() + task["timeout"] if task["timeout"] else None
+            running[executor.submit(self._run_attempt, name, kwargs)] = (name, deadline)
+
+        def _finish(name, status, result=None, error=None):
+            task_result = results[name]
+            task_result.status, task_result.result, task_result.error = status, result, error
+            task_result.seconds = time.perf_counter() - started[name] if name in started else 0.0
+            self.metrics.incr(f"tasks_{status}")
+            if status == SUCCEEDED:
+                logger.info("Task %s succeeded in %.2fs.", name, task_result.seconds)
+            else:
+                logger.warning("Task %s %s: %s", name, status, error)
+
+        def _attempt_failed(name, error):
+            task = self.tasks[name]
+            if results[name].attempts <= task["retries"]:
+                logger.info("Task %s attempt %d failed (%s); retrying.", name, results[name].attempts, error)
+                self.metrics.incr("task_retries")
+                waiting[name] = time.monotonic() + task["retry_delay"]
+            else:
+                _finish(name, FAILED, error=error)
+
+        try:
+            while pending or running or waiting:
+                # Start ready tasks; skip those downstream of a failure.
+                for name in list(pending):
+                    dep_status = [results[d].status for d in self.tasks[name]["deps"]]
+                    if any(s in (FAILED, SKIPPED) for s in dep_status):
+                        pending.remove(name)
+                        _finish(name, SKIPPED, error="upstream task failed")
+                    elif all(s == SUCCEEDED for s in dep_status):
+                        pending.remove(name)
+                        _submit(name)
+                now = time.monotonic()
+                for name, ready_at in list(waiting.items()):
+                    if ready_at <= now:
+                        del waiting[name]
+                        _submit(name)
+                if not running:
+                    if waiting: time.sleep(max(0.0, min(waiting.values()) - time.monotonic()))
+                    continue
+
+                deadlines = [d for _, d in running.values() if d is not None] + list(waiting.values())
+                wait_timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                done, _ = wait(list(running), timeout=wait_timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, _ = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        _attempt_failed(name, e)
+                        continue
+                    try:
+                        if self.tasks[name]["sink"] and self.sink is not None: self.sink(name, result)
+                    except Exception as e:
+                        _finish(name, FAILED, error=e) # the result is there; only the hand-off failed.
+                        continue
+                    _finish(name, SUCCEEDED, result=result)
+                now = time.monotonic()
+                for future, (name, deadline) in list(running.items()):
+                    if deadline is not None and deadline <= now:
+                        del running[future] # abandoned; the thread finishes on its own.
+                        future.cancel()
+                        _attempt_failed(name, TimeoutError(f"{name} exceeded {self.tasks[name]['timeout']}s"))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+
+class MemorySink:
+    ''' Keeps every sunk result; thread-safe. '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.results = {}
+
+    def __call__(self, name, result):
+        with self._lock:
+            self.results[name] = result
+
+
+class DirectorySink(MemorySink):
+    ''' Also writes DataFrame results to output_dir/<name>.csv (atomic replace). '''
+
+    def __init__(self, output_dir):
+        super().__init__()
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def __call__(self, name, result):
+        super().__call__(name, result)
+        if hasattr(result, "to_csv"):
+            output_path = os.path.join(self.output_dir, f"{name}.csv")
+            tmp_path = f"{output_path}.part"
+            result.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, output_path)
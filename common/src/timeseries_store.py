@@ -0,0 +1,132 @@
+####################################
+# Notes: Local history of the published series in one
+# SQLite file, keyed by (dataset, trade_date, series).
+# Writes are deduplicated: a row is only touched when
+# its value is new or changed, and each write stamps
+# the touched rows with the dataset's next sequence
+# number. get_delta returns the rows changed since a
+# consumer's last mark_published, so downstream loads
+# scale with the changes, not the snapshot.
+#   datasets: "cme" (Date + a column per product),
+#             "eia" (Date + a column per area).
+#             "cme_curve" (long form, one series per
+#             product and contract month).
+####################################
+
+import sqlite3
+import datetime
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS observations (
+           dataset TEXT NOT NULL, trade_date TEXT NOT NULL, series TEXT NOT NULL,
+           value REAL, seq INTEGER NOT NULL, updated_at TEXT NOT NULL,
+           PRIMARY KEY (dataset, trade_date, series)) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS observations_seq ON observations (dataset, seq)",
+    """CREATE TABLE IF NOT EXISTS publishes (
+           dataset TEXT NOT NULL, consumer TEXT NOT NULL, seq INTEGER NOT NULL, published_at TEXT NOT NULL,
+           PRIMARY KEY (dataset, consumer))""",
+]
+
+UPSERT_SQL = """INSERT INTO observations (dataset, trade_date, series, value, seq, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (dataset, trade_date, series) DO UPDATE
+                SET value = excluded.value, seq = excluded.seq, updated_at = excluded.updated_at
+                WHERE observations.value IS NOT excluded.value"""
+
+
+class TimeSeriesStore:
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for sql in SCHEMA:
+                conn.execute(sql)
+
+    @contextmanager
+    def _connect(self):
+        ''' One connection per call (thread-safe); commits on success. '''
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def write(self, dataset, df, date_column="Date", value_columns=None):
+        '''
+            Wide frame in (date_column plus one column
+            per series). Returns the number of rows
+            that were new or changed; unchanged and
+            NaN values are skipped.
+        '''
+        value_columns = list(value_columns or [c for c in df.columns if c != date_column])
+        long = df.melt(id_vars=[date_column], value_vars=value_columns, var_name="series", value_name="value").dropna(subset=["value"])
+        return self.write_long(dataset, long, date_column=date_column)
+
+    def write_long(self, dataset, df, date_column="Date", series_column="series", value_column="value"):
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        dates = pd.to_datetime(df[date_column]).dt.strftime("%Y-%m-%d")
+        with self._lock, self._connect() as conn:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM observations WHERE dataset = ?", (dataset,)).fetchone()[0]
+            before = conn.total_changes
+            conn.executemany(UPSERT_SQL, zip([dataset]*len(df), dates, df[series_column].astype(str),
+                                             df[value_column].astype(float), [seq]*len(df), [now]*len(df)))
+            return conn.total_changes - before
+
+    def _read(self, sql, params, wide):
+        with self._connect() as conn:
+            long = pd.read_sql_query(sql, conn, params=params)
+        if not wide: return long
+        if long.empty: return pd.DataFrame({"Date":[]})
+        df = long.pivot(index="trade_date", columns="series", values="value")
+        df = df.sort_index(ascending=False).reset_index().rename(columns={"trade_date":"Date"})
+        df.columns.name = None
+        return df
+
+    def get_history(self, dataset, start=None, end=None, series=None, wide=True):
+        ''' Stored rows for dataset, optionally limited to [start, end] and some series. '''
+        sql = "SELECT trade_date, series, value, seq, updated_at FROM observations WHERE dataset = ?"
+        params = [dataset]
+        if start is not None: sql += " AND trade_date >= ?"; params.append(str(start))
+        if end is not None: sql += " AND trade_date <= ?"; params.append(str(end))
+        if series is not None:
+            series = list(series)
+            sql += f" AND series IN ({', '.join('?'*len(series))})"; params.extend(series)
+        return self._read(sql + " ORDER BY trade_date DESC, series", params, wide)
+
+    def get_latest_date(self, dataset):
+        ''' Latest stored trade_date (YYYY-MM-DD) for dataset, or None. '''
+        with self._connect() as conn:
+            return conn.execute("SELECT MAX(trade_date) FROM observations WHERE dataset = ?", (dataset,)).fetchone()[0]
+
+    def get_published_seq(self, dataset, consumer="synapse"):
+        with self._connect() as conn:
+            row = conn.execute("SELECT seq FROM publishes WHERE dataset = ? AND consumer = ?", (dataset, consumer)).fetchone()
+        return row[0] if row else 0
+
+    def get_delta(self, dataset, consumer="synapse", wide=True):
+        '''
+            Rows new or changed since consumer's last
+            mark_published. Returns (df, seq); pass
+            seq to mark_published once the rows are
+            loaded. wide=True returns only the changed
+            series for each date (NaN elsewhere).
+        '''
+        since = self.get_published_seq(dataset, consumer)
+        with self._connect() as conn:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM observations WHERE dataset = ?", (dataset,)).fetchone()[0]
+        sql = ("SELECT trade_date, series, value, seq, updated_at FROM observations"
+               " WHERE dataset = ? AND seq > ? AND seq <= ? ORDER BY trade_date DESC, series")
+        return self._read(sql, [dataset, since, seq], wide), seq
+
+    def mark_published(self, dataset, seq, consumer="synapse"):
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._connect() as conn:
+            conn.execute("""INSERT INTO publishes (dataset, consumer, seq, published_at) VALUES (?, ?, ?, ?)
+                            ON CONFLICT (dataset, consumer) DO UPDATE SET seq = excluded.seq, published_at = excluded.published_at""",
+                         (dataset, consumer, seq, now))
@@ -0,0 +1,172 @@
+####################################
+# Notes: Watch mode. Polls Datamine and EIA for the
+# next expected publication with cheap probes and runs
+# the pipeline (run_pipelines --only <source>) as soon
+# as it is up.
+#   CME: the calendar's last settlement date; probed
+#        with a 1-byte Range GET per fid.
+#   EIA: the week after the last period seen; not
+#        probed until publish_lag_days after it ends,
+#        then one length=1 call per series.
+# A source with nothing due is polled every
+# max_interval. A due source starts at min_interval
+# and backs off (x backoff, jittered) after each miss.
+# The last trade date/period run is kept in
+# state_path, so a restart does not rerun it.
+#
+#   python -m common.src.watch --store history.db --output-dir out
+####################################
+
+import os, time, random, argparse, logging
+import datetime
+
+from common.src.json_state import load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+IDLE = "idle"          # nothing expected yet
+PENDING = "pending"    # expected, not published yet
+NEW = "new"            # published; run the pipeline
+
+
+class PublicationWatcher:
+
+    def __init__(self, on_new, cme=None, fid_dict=None, eia=None, state_path="watch_state.json",
+                 min_interval=60.0, max_interval=900.0, backoff=2.0, eia_publish_lag_days=4):
+        '''
+            on_new(source, period) runs the pipeline
+            for "cme" or "eia" and returns True on
+            success; the period is only recorded then.
+        '''
+        self.on_new = on_new
+        self.cme = cme
+        self.fid_dict = fid_dict or {}
+        self.eia = eia
+        self.state_path = state_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.eia_publish_lag_days = eia_publish_lag_days
+        self.state = self._load_state()
+        self.sources = [s for s, api in (("cme", cme), ("eia", eia)) if api is not None]
+        self._interval = {s:min_interval for s in self.sources}
+        self._next_poll = {s:0.0 for s in self.sources}
+
+    def _load_state(self):
+        return load_json(self.state_path, {}) # corrupt; the next publication is run again.
+
+    def _save_state(self):
+        save_json(self.state_path, self.state, indent=1, sort_keys=True)
+
+    def check_cme(self, now=None):
+        ''' (status, trade date as YYYY-MM-DD). '''
+        now = now or datetime.datetime.now()
+        expected = self.cme.calendar.last_settlement_date(as_of=now, publish_hour=self.cme.publish_hour).isoformat()
+        if self.state.get("cme") is not None and expected <= self.state["cme"]: return IDLE, expected
+        trade_date = datetime.date.fromisoformat(expected)
+        if all(self.cme.is_published(fid, trade_date) for fid in self.fid_dict): return NEW, expected
+        return PENDING, expected
+
+    def check_eia(self, now=None):
+        ''' (status, period as YYYY-MM-DD). '''
+        now = now or datetime.datetime.now()
+        last = self.state.get("eia")
+        if last is not None:
+            expected = datetime.date.fromisoformat(last) + datetime.timedelta(days=7)
+            if now.date() < expected + datetime.timedelta(days=self.eia_publish_lag_days): return IDLE, expected.isoformat()
+        period = self.eia.get_latest_period()
+        if period is not None and (last is None or period > last): return NEW, period
+        return PENDING, period
+
+    def poll(self, source, now=None):
+        '''
+            One check of source; runs the pipeline when
+            it is new. Returns the status and schedules
+            the next poll.
+        '''
+        try:
+            status, period = (self.check_cme if source == "cme" else self.check_eia)(now)
+        except Exception as e:
+            logger.warning("Probe for %s failed: %s", source, e)
+            status, period = PENDING, None
+
+        if status == NEW:
+            logger.info("New %s publication: %s; running the pipeline.", source, period)
+            if self.on_new(source, period):
+                self.state[source] = period
+                self._save_state()
+                self._interval[source] = self.min_interval
+                delay = self.max_interval
+            else:
+                status = PENDING # run failed; retry on the backoff.
+        if status == PENDING:
+            delay = self._interval[source]
+            self._interval[source] = min(self.max_interval, self._interval[source]*self.backoff)
+        elif status == IDLE:
+            self._interval[source] = self.min_interval
+            delay = self.max_interval
+        delay *= random.uniform(0.8, 1.2) # keep workers off the same second
+        self._next_poll[source] = time.monotonic() + delay
+        logger.debug("%s %s (%s); next poll in %.0fs.", source, status, period, delay)
+        return status
+
+    def run(self, max_polls=None):
+        ''' Polls until interrupted (or max_polls checks have run). '''
+        n_polls = 0
+        while max_polls is None or n_polls < max_polls:
+            source = min(self.sources, key=self._next_poll.get)
+            wait = self._next_poll[source] - time.monotonic()
+            if wait > 0: time.sleep(wait)
+            self.poll(source)
+            n_polls += 1
+
+
+def run_pipeline(main, argv):
+    '''
+        main(argv) == 0. A failed run, or an argparse
+        exit on a bad passthrough argument, is logged
+        and returns False so the watch keeps polling.
+    '''
+    try:
+        return main(argv) == 0
+    except SystemExit as e:
+        logger.error("Pipeline exited (%s) with arguments %s.", e.code, argv)
+    except Exception:
+        logger.exception("Pipeline run failed with arguments %s.", argv)
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch Datamine and EIA; run the pipeline on each new publication.")
+    parser.add_argument("--only", choices=["cme", "eia"], action="append", help="Watch a subset (repeatable).")
+    parser.add_argument("--state", default="watch_state.json")
+    parser.add_argument("--min-interval", type=float, default=60.0, help="Seconds between polls once a publication is due.")
+    parser.add_argument("--max-interval", type=float, default=900.0, help="Seconds between polls otherwise.")
+    parser.add_argument("--publish-hour", type=int, help="Exchange-time hour the CME settlement files are up (default CME_PUBLISH_HOUR or 18).")
+    args, pipeline_args = parser.parse_known_args(argv)
+    only = set(args.only or ["cme", "eia"])
+
+    from common.src import run_pipelines
+    cme = eia = fid_dict = None
+    if "cme" in only:
+        from cme.src.pull_cme_data import CMEDatamineAPI, FID_DICT
+        cme = CMEDatamineAPI(publish_hour=args.publish_hour, cache_dir=os.environ.get("CME_CACHE_DIR"))
+        fid_dict = FID_DICT
+    if "eia" in only:
+        from eia.src.pull_eia_data import eiaapi
+        eia = eiaapi()
+
+    # Everything not parsed here (--store, --output-dir, ...) goes to run_pipelines.
+    if args.publish_hour is not None: pipeline_args += ["--publish-hour", str(args.publish_hour)]
+    on_new = lambda source, period: run_pipeline(run_pipelines.main, pipeline_args + ["--only", source])
+    watcher = PublicationWatcher(on_new, cme=cme, fid_dict=fid_dict, eia=eia, state_path=args.state,
+                                 min_interval=args.min_interval, max_interval=args.max_interval)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        logger.info("Watch stopped.")
+
+if __name__ == "__main__":
+    # Quiet by default; LOG_LEVEL=INFO logs each publication and pipeline run.
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    main()
@@ -13,146 +13,262 @@
 #
 ####################################
 
-import os
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
-import datetime
-import pandas as pd
+import os, logging
+from concurrent.futures import ThreadPoolExecutor
+
+from common.src.parquet_output import write_partitioned_parquet
+from eia.src.sync_store import EIASyncStore
+from common.src.metrics import PipelineMetrics
+from common.src.http_transport import get_default_transport
+from common.src.lazy_import import lazy_import
+
+# Imported on first use; get_records never needs it.
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+# EIA v2 returns at most this many rows per call.
+MAX_PAGE_LENGTH = 5000
 
 YUP = "YUP"
 YRL = "YRL"
 GINP = "EPXXX2"
+# Utilization is YRL (operable capacity) against GINP (gross input);
+# YUP is still fetched but an empty YUP response is not an error.
+REQUIRED_SERIES = (YRL, GINP)
 
 class eiaapi():
 
-    def __init__(self):
+    def __init__(self, sync_dir=None, metrics=None, transport=None):
         def _define_datasets():
             dataset=[{"process":YUP}, {"process":YRL}, {"product":GINP}]
             return dataset
         
         self.base_url = "https://api.eia.gov/v2/petroleum/"
         self.dataset = _define_datasets()
+        # Optional local copy; get_data then only fetches periods after each facet's watermark.
+        self.sync_store = EIASyncStore(sync_dir) if sync_dir else None
+        # Stage timings and counters; see common/src/metrics.py.
+        self.metrics = metrics or PipelineMetrics("eia")
+        # Pooled, rate-limited HTTP shared with CMEDatamineAPI (see common/src/http_transport.py).
+        self.transport = transport or get_default_transport()
+
+    def get_url(self, key, facet, offset=0, length=MAX_PAGE_LENGTH, start=None):
+        ''' Weekly wiup values for one facet, newest first; start (YYYY-MM-DD) limits the periods. '''
+        start_filter = f"&start={start}" if start else ""
+        endpoint = f"pnp/wiup/data/?api_key={os.environ['EIA_API_KEY']}&frequency=weekly&data[0]=value&facets[{key}][]={facet}{start_filter}&sort[0][column]=period&sort[0][direction]=desc&offset={offset}&length={length}"
+        return self.base_url + endpoint
         
 
-    def get_data(self):
+    def get_data(self, length=12, full_history=False, max_workers=3, areas=("U.S.", "PADD 3"), all_periods=False, wide=True):
+        '''
+            length: most recent weekly rows per series.
+            full_history=True pages through every
+            period instead. The series are fetched
+            concurrently.
 
-        def _execute_calls_get_objects():
-                # Define the retry strategy.
-                retry_strategy = Retry(
-                    total=4,  # Maximum number of retries.
-                    status_forcelist=[429, 500, 502, 503, 504],  # the HTTP status codes to retry on.
-                )
-                
-                adapter = HTTPAdapter(max_retries=retry_strategy)
-                
-                # Create a new session object.
-                session = requests.Session()
-                session.mount("https://", adapter)
+            areas: area names to keep (None for every
+            PADD). all_periods=False keeps the latest
+            period only. wide=True returns Date plus a
+            column per area (the upsert shape);
+            wide=False returns the tidy long table.
 
+            With a sync store, only periods after the
+            stored watermark are requested (conditional
+            headers included) and the cached series is
+            used for everything older.
+        '''
+
+        def _execute_calls_get_objects():
                 # gross input: https://api.eia.gov/v2/petroleum/pnp/wiup/data/?frequency=weekly&data[0]=value&facets[product][]=EPXXX2&sort[0][column]=period&sort[0][direction]=desc&offset=0&length=5000
                 # ref op cap: 
-                responses_dict = {}
-                for data in self.dataset:
-                    keys = [k for k in data.keys()]; key = keys[0]
-                    endpoint = f"pnp/wiup/data/?api_key={os.environ['EIA_API_KEY']}&frequency=weekly&data[0]=value&facets[{key}][]={data[key]}&sort[0][column]=period&sort[0][direction]=desc&offset=0&length=12"
-                    url = self.base_url + endpoint
-                    response = session.get(url)
-                    status_code = response.status_code
-                    if status_code == 200:
-                        print(f"Success: {status_code}. {url}")
-                        responses_dict[data[key]]=response
-                    else:
-                         print(f"Failed: {status_code}. {url}")
-                         responses_dict[data[key]] = []
-
-                return responses_dict
-    
-        def _return_most_recent_friday__from_date(datetime_day):
-            weekday = datetime_day.weekday()
-            if weekday < 4: datetime_friday = datetime_day - datetime.timedelta(days=(weekday+3))
-            elif weekday == 4: datetime_friday = datetime_day
-            else: datetime_friday = datetime_day - datetime.timedelta(days=(weekday-4))
-            return datetime_friday
+                with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(self.dataset)))) as executor:
+                    dfs = executor.map(_fetch_series, self.dataset)
+                    return {list(data.values())[0]:df for data, df in zip(self.dataset, dfs)}
 
-        def _process_into_utilization(df_dict):
-            
-            def __transform_df_for_azure(df):
+        def _fetch_series(data):
                 '''
-                    Requires percent-utilization,
-                    and names.
+                    Pages offset/length until the series is
+                    exhausted (or length rows are in) and
+                    returns one frame. A failed call gives an
+                    empty frame for the series (the cached
+                    copy when syncing).
                 '''
-                df_transform = pd.DataFrame({})
-                for col in df.columns:
-                    if col == "period":
-                        val = df[col].unique()[0]
-                        df_transform["Date"] = pd.Series(val)
-                    if col == "area-name":
-                        tr_cols = [tr_col.replace(" ", "") for tr_col in df[col].to_list()]
-                    if col == "percent-utilization":
-                        tr_vals = df[col].to_list()
-
-                for k, v in zip(tr_cols, tr_vals):
-                    df_transform[k] = pd.Series(v)
-                
-                return df_transform[["Date", "U.S.", "PADD3"]]
-
-            df_yup = pd.DataFrame({})
-            df_yrl = pd.DataFrame({})
-            df_ginp = pd.DataFrame({})
-
-            for k in df_dict.keys():
-                if k == YUP: 
-                    df_yup = df_dict[k]
-                elif k == YRL: 
-                    df_yrl = df_dict[k]
-                elif k == GINP: 
-                    df_ginp = df_dict[k]
+                keys = [k for k in data.keys()]; key = keys[0]
+                facet = data[key]
+                start_date = self.sync_store.get_start_date(facet) if self.sync_store else None
+                headers = self.sync_store.get_conditional_headers(facet) if start_date else {}
+                n_wanted = None if (full_history or start_date) else length
+                pages = []; offset = 0; validators = {}
+                while True:
+                    page_length = MAX_PAGE_LENGTH if n_wanted is None else min(MAX_PAGE_LENGTH, n_wanted - offset)
+                    url = self.get_url(key, facet, offset=offset, length=page_length, start=start_date)
+                    with self.metrics.stage("download", facet=facet, offset=offset):
+                        response = self.transport.get(url, metrics=self.metrics, headers=headers if offset == 0 else {})
+                    self.metrics.record_response(response)
+                    status_code = response.status_code
+                    if status_code == 304:
+                        logger.info("Not modified: %s. %s", status_code, url)
+                        break
+                    if status_code != 200:
+                         logger.warning("Failed: %s. %s", status_code, url)
+                         return self.sync_store.get_cached(facet) if self.sync_store else pd.DataFrame({})
+                    logger.info("Success: %s. %s", status_code, url)
+                    self.metrics.incr("bytes_downloaded", len(response.content))
+                    if offset == 0:
+                        validators = {"etag":response.headers.get("ETag"), "last_modified":response.headers.get("Last-Modified")}
 
+                    body = response.json()["response"]
+                    records = body["data"]
+                    if records: pages.append(pd.DataFrame(data=records))
+                    offset += len(records)
+                    total = int(body.get("total", offset))
+                    if not records or offset >= total or (n_wanted is not None and offset >= n_wanted): break
+
+                df = pd.concat(pages, ignore_index=True) if pages else pd.DataFrame({})
+                if self.sync_store: return self.sync_store.merge(facet, df, **validators)
+                return df
+    
+        def _process_into_utilization(df_dict):
+            '''
+                Percent utilization for every period and
+                area at once: YRL (operable capacity) is
+                joined to EPXXX2 (gross input) on period
+                and area, and the ratio is one column
+                operation. Returns the tidy long table.
+            '''
             columns = ["period", "duoarea", "area-name", "series-description", "value", "units"]
-            df_yup_ = df_yup[columns]
-            area_names = ["PADD 3", "U.S."]
-            merge_columns = columns[0:3]; columns.append("product-name")
-            df_ = df_yrl.merge(right=df_ginp[columns], how="inner", on=merge_columns, suffixes=("", ".ginp"))
-            filter_columns = columns.copy(); filter_columns.extend(["series-description.ginp", "value.ginp", "units.ginp"])
-            df_eia = df_[filter_columns]
-            df_eia = df_eia.drop(labels=["product-name"], axis=1)
+            merge_columns = columns[0:3]
             map_names = {"series-description":"output-description", "value":"output-value", "units":"output-units", 
                          "series-description.ginp":"input-description", "value.ginp":"input-value", "units.ginp":"input-units"}
             map = {"output-description":str, "output-value":float, "output-units":str, 
                          "input-description":str, "input-value":float, "input-units":str}
-            df_eia = df_eia.rename(columns=map_names)
-            df_eia = df_eia.astype(map)
-            df_eia["percent-utilization"] = (df_eia["input-value"]/df_eia["output-value"])*100
-            df_eia["percent-utilization"] = df_eia["percent-utilization"].round(2)
-            
-            datetime_friday = _return_most_recent_friday__from_date(datetime.datetime.today()); datestr_friday = datetime_friday.strftime("%Y-%m-%d")
-            datetime_prev_friday = datetime_friday - datetime.timedelta(days=7); datestr_prev_friday = datetime_prev_friday.strftime("%Y-%m-%d")
-            merge_columns.append("percent-utilization")
-            df_eia_fil = df_eia[(df_eia["period"]==datetime_friday) & (df_eia["area-name"].isin(area_names))][merge_columns]
-            if df_eia_fil.empty:
-                df_eia_fil = df_eia[(df_eia["period"]==datestr_prev_friday) & (df_eia["area-name"].isin(area_names))][merge_columns]
-            df_eia_fil.reset_index(drop=True, inplace=True)
-            df_eia_final = __transform_df_for_azure(df_eia_fil)
-            return df_eia_final
+
+            df_eia = df_dict[YRL][columns].merge(right=df_dict[GINP][columns], how="inner", on=merge_columns, suffixes=("", ".ginp"))
+            df_eia = df_eia.rename(columns=map_names).astype(map)
+            df_eia["percent-utilization"] = ((df_eia["input-value"]/df_eia["output-value"])*100).round(2)
+
+            if areas is not None: df_eia = df_eia[df_eia["area-name"].isin(areas)]
+            if not all_periods: df_eia = df_eia[df_eia["period"] == df_eia["period"].max()]
+            df_eia = df_eia.drop_duplicates(subset=merge_columns, keep="first")
+            return df_eia.sort_values(["period", "duoarea"], ascending=[False, True]).reset_index(drop=True)
+
+        def _transform_df_for_azure(df_long):
+            '''
+                Wide view: one row per period (Date), one
+                column per area with spaces removed
+                ("PADD 3" -> "PADD3").
+            '''
+            df_wide = df_long.assign(area=df_long["area-name"].str.replace(" ", "", regex=False)) \
+                .pivot(index="period", columns="area", values="percent-utilization")
+            df_wide = df_wide.sort_index(ascending=False).reset_index().rename(columns={"period":"Date"})
+            df_wide.columns.name = None
+            if areas is not None:
+                df_wide = df_wide[["Date"] + [a.replace(" ", "") for a in areas if a.replace(" ", "") in df_wide.columns]]
+            return df_wide
 
         # Entry:
         # ``````
-        responses_dict = _execute_calls_get_objects()
-        df_dict = {}
-        for k in responses_dict:
-            response_object = responses_dict[k]
-            data_records = response_object.json()["response"]["data"]
-            df = pd.DataFrame(data=data_records)
-            df_dict[k] = df
-        
-        df = _process_into_utilization(df_dict)
+        df_dict = _execute_calls_get_objects()
+        missing = [k for k in REQUIRED_SERIES if df_dict[k].empty]
+        if missing: raise ValueError(f"EIA returned no data for: {missing}")
+        with self.metrics.stage("transform"):
+            df = _process_into_utilization(df_dict)
+            if wide: df = _transform_df_for_azure(df)
 
         return df
 
+    def get_records(self, length=12, max_workers=3, areas=("U.S.", "PADD 3")):
+        '''
+            Lean path for get_data()'s default output:
+            one call per series, joined and divided in
+            plain Python (no pandas). Returns
+            [{"Date": latest period, "U.S.": pct, ...}],
+            areas with spaces removed, in areas order.
+        '''
+        def _fetch_records(data):
+            key, facet = next(iter(data.items()))
+            url = self.get_url(key, facet, length=length)
+            with self.metrics.stage("download", facet=facet):
+                response = self.transport.get(url, metrics=self.metrics)
+            self.metrics.record_response(response)
+            if response.status_code != 200:
+                logger.warning("Failed: %s. %s", response.status_code, url)
+                return facet, []
+            logger.info("Success: %s. %s", response.status_code, url)
+            self.metrics.incr("bytes_downloaded", len(response.content))
+            return facet, response.json()["response"]["data"]
+
+        def _by_key(records):
+            ''' First record per (period, duoarea, area-name), as get_data's drop_duplicates keeps. '''
+            keyed = {}
+            for record in records:
+                keyed.setdefault((record["period"], record["duoarea"], record["area-name"]), record)
+            return keyed
+
+        def _to_float(value):
+            return None if value is None else float(value)
+
+        # Entry:
+        # ``````
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(self.dataset)))) as executor:
+            record_dict = dict(executor.map(_fetch_records, self.dataset))
+        missing = [k for k in REQUIRED_SERIES if not record_dict[k]]
+        if missing: raise ValueError(f"EIA returned no data for: {missing}")
+
+        with self.metrics.stage("transform"):
+            capacity, gross_input = _by_key(record_dict[YRL]), _by_key(record_dict[GINP])
+            joined = [key for key in capacity if key in gross_input and (areas is None or key[2] in areas)]
+            if not joined: return []
+            period = max(key[0] for key in joined)
+            utilization = {}
+            for key in joined:
+                if key[0] != period: continue
+                output_value, input_value = _to_float(capacity[key]["value"]), _to_float(gross_input[key]["value"])
+                percent = None if not output_value or input_value is None else round(input_value/output_value*100, 2)
+                utilization[key[2].replace(" ", "")] = percent
+
+        names = [a.replace(" ", "") for a in areas] if areas is not None else sorted(utilization)
+        return [dict([("Date", period)] + [(name, utilization[name]) for name in names if name in utilization])]
+
+    def get_latest_period(self):
+        '''
+            Cheap probe for watch mode: the latest
+            period (YYYY-MM-DD) every series has, from
+            one length=1 call per required series;
+            None if a call fails.
+        '''
+        periods = []
+        for data in self.dataset:
+            key, facet = next(iter(data.items()))
+            if facet not in REQUIRED_SERIES: continue
+            self.metrics.incr("probes")
+            response = self.transport.get(self.get_url(key, facet, length=1), metrics=self.metrics)
+            if response.status_code != 200: return None
+            records = response.json()["response"]["data"]
+            if not records: return None
+            periods.append(records[0]["period"])
+        return min(periods)
+
+    def write_parquet(self, df, output_dir, dataset="refinery_utilization"):
+        '''
+            Typed Parquet handoff for Spark,
+            partitioned by Date and Dataset.
+        '''
+        df = df.copy()
+        value_columns = [col for col in df.columns if col != "Date"]
+        df[value_columns] = df[value_columns].astype("float64")
+        df["Dataset"] = dataset
+        with self.metrics.stage("write", output=output_dir):
+            return write_partitioned_parquet(df, output_dir, partition_cols=["Date", "Dataset"])
+
 
 if __name__ == "__main__":
-     eia = eiaapi()
+     # Quiet by default; LOG_LEVEL=INFO adds request status and the metrics summary, DEBUG every stage.
+     logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+     eia = eiaapi(sync_dir=os.environ.get("EIA_SYNC_DIR"))
 
      df = eia.get_data()
+     if os.environ.get("EIA_PARQUET_DIR"): eia.write_parquet(df, os.environ["EIA_PARQUET_DIR"])
+     eia.metrics.emit()
      print(df)
\ No newline at end of file
@@ -0,0 +1,92 @@
+####################################
+# Notes: Local copy of the EIA weekly series for
+# incremental sync. Per facet: <facet>.csv holds every
+# row pulled so far; watermarks.json holds the latest
+# period plus the ETag/Last-Modified of the last call.
+# get_data asks only for periods after the watermark
+# and merges just those rows.
+####################################
+
+import os
+import datetime
+import threading
+
+from common.src.lazy_import import lazy_import
+from common.src.json_state import load_json, save_json
+
+pd = lazy_import("pandas")
+
+KEY_COLUMNS = ["period", "duoarea", "product", "process", "series"]
+
+
+class EIASyncStore:
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.watermarks_path = os.path.join(store_dir, "watermarks.json")
+        self._lock = threading.Lock()
+        os.makedirs(store_dir, exist_ok=True)
+        self._watermarks = self._load_watermarks()
+
+    def _load_watermarks(self):
+        return load_json(self.watermarks_path, {}) # corrupt; next sync refetches from the cached rows' max period.
+
+    def _save_watermarks(self):
+        save_json(self.watermarks_path, self._watermarks, indent=1, sort_keys=True)
+
+    def _series_path(self, facet):
+        return os.path.join(self.store_dir, f"{facet}.csv")
+
+    def get_watermark(self, facet):
+        ''' Latest stored period (YYYY-MM-DD) for facet, or None. '''
+        with self._lock:
+            period = self._watermarks.get(facet, {}).get("period")
+        if period is None and os.path.exists(self._series_path(facet)):
+            cached = self.get_cached(facet)
+            if not cached.empty: period = cached["period"].max()
+        return period
+
+    def get_start_date(self, facet):
+        ''' First period to request: the day after the watermark. '''
+        period = self.get_watermark(facet)
+        if period is None: return None
+        return (datetime.date.fromisoformat(period) + datetime.timedelta(days=1)).isoformat()
+
+    def get_conditional_headers(self, facet):
+        with self._lock:
+            entry = self._watermarks.get(facet, {})
+        headers = {}
+        if entry.get("etag"): headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"): headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def get_cached(self, facet):
+        path = self._series_path(facet)
+        if not os.path.exists(path): return pd.DataFrame({})
+        return pd.read_csv(path, dtype=str)
+
+    def merge(self, facet, df_new, etag=None, last_modified=None):
+        '''
+            Adds rows newer than the watermark and
+            returns the full cached series, most
+            recent period first. An empty df_new
+            leaves the rows untouched.
+        '''
+        with self._lock:
+            entry = self._watermarks.setdefault(facet, {})
+            if etag: entry["etag"] = etag
+            if last_modified: entry["last_modified"] = last_modified
+
+            path = self._series_path(facet)
+            cached = pd.read_csv(path, dtype=str) if os.path.exists(path) else pd.DataFrame({})
+            if not df_new.empty:
+                df_new = df_new.astype(str)
+                keys = [c for c in KEY_COLUMNS if c in df_new.columns]
+                cached = pd.concat([cached, df_new], ignore_index=True).drop_duplicates(subset=keys, keep="last")
+                cached = cached.sort_values("period", ascending=False, kind="stable").reset_index(drop=True)
+                tmp_path = f"{path}.part"
+                cached.to_csv(tmp_path, index=False)
+                os.replace(tmp_path, path)
+            if not cached.empty: entry["period"] = cached["period"].max()
+            self._save_watermarks()
+            return cached
@@ -0,0 +1,71 @@
+####################################
+# Notes: Derived series and the incremental
+# update_derived over the SQLite history store.
+#
+#   python -m pytest tests
+####################################
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.src.derived_metrics import DERIVED_SERIES, compute_derived, get_lookback, update_derived
+from common.src.timeseries_store import TimeSeriesStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TimeSeriesStore(str(tmp_path / "history.sqlite"))
+
+def _weeks(start, n):
+    dates = pd.date_range(start, periods=n, freq="7D").strftime("%Y-%m-%d")
+    us = 100.0 + np.arange(n)**1.5
+    return pd.DataFrame({"Date":dates, "U.S.":us, "PADD3":us/2 - np.arange(n)})
+
+
+def test_lookback_chains_through_derived_inputs():
+    assert get_lookback(DERIVED_SERIES["eia"]) == 4
+    assert get_lookback(DERIVED_SERIES["cme"]) == 21
+    chained = {"s":{"op":"spread", "inputs":["a", "b"]},
+               "s 5":{"op":"rolling_mean", "inputs":["s"], "window":5},
+               "s 5 vol 3":{"op":"rolling_vol", "inputs":["s 5"], "window":3}}
+    assert get_lookback(chained) == 9
+
+def test_compute_derived_skips_missing_inputs():
+    out = compute_derived(_weeks("2024-01-05", 5).drop(columns=["PADD3"]), DERIVED_SERIES["eia"])
+    assert list(out.columns) == ["Date", "U.S. 4W Avg"]
+    assert out["U.S. 4W Avg"].isna().sum() == 3
+
+def test_update_derived_only_recomputes_new_dates(store):
+    weeks = _weeks("2024-01-05", 10)
+    store.write("eia", weeks.iloc[:6])
+    first = update_derived(store, "eia")
+    assert list(first["Date"]) == list(weeks["Date"].iloc[:6])
+    _, seq = store.get_delta("eia_derived")
+    store.mark_published("eia_derived", seq)
+
+    store.write("eia", weeks.iloc[6:])
+    second = update_derived(store, "eia")
+    assert list(second["Date"]) == list(weeks["Date"].iloc[6:])
+
+    # The 4-week averages of the new dates reach back into the stored weeks.
+    full = compute_derived(weeks, DERIVED_SERIES["eia"])
+    expected = full.iloc[6:].reset_index(drop=True)
+    pd.testing.assert_frame_equal(second, expected)
+    assert second["U.S. 4W Avg"].notna().all()
+
+    delta, _ = store.get_delta("eia_derived")
+    assert sorted(delta["Date"]) == list(weeks["Date"].iloc[6:])
+
+    assert update_derived(store, "eia").empty
+
+def test_update_derived_reads_only_the_lookback(store, monkeypatch):
+    store.write("eia", _weeks("2024-01-05", 10))
+    update_derived(store, "eia")
+    store.write("eia", _weeks("2024-03-15", 1))
+
+    seen = []
+    real = compute_derived
+    monkeypatch.setattr("common.src.derived_metrics.compute_derived", lambda df, d: seen.append(len(df)) or real(df, d))
+    assert len(update_derived(store, "eia")) == 1
+    assert seen == [1 + get_lookback(DERIVED_SERIES["eia"])]
@@ -0,0 +1,97 @@
+####################################
+# Notes: The fixed-width slicer against the per-token
+# parser (_get_trimmed_line_list) on synthetic reports,
+# and the record path's plain-Python splitter against
+# the slicer.
+#
+#   python -m pytest tests
+####################################
+
+import re
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_reports import generate_report, _format_row
+from cme.src import pull_cme_data, products
+from cme.src.pull_cme_data import (COLUMNS, COUNT_COLUMNS, _scan_report_lines, _section_lines_to_df, _section_lines_to_rows,
+                                   _slice_fixed_width, _split_fixed_width, _to_float)
+
+
+def _get_sections(**kwargs):
+    lines = generate_report(**kwargs).splitlines(keepends=True)
+    return _scan_report_lines(lines, list(products.PRODUCTS))
+
+def _get_token_df(data_set, lines):
+    with mock.patch.object(pull_cme_data, "_slice_fixed_width", return_value=None):
+        return _section_lines_to_df(data_set, lines)
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("short_row_share", [0.0, 0.3, 1.0])
+@pytest.mark.parametrize("rows_per_section", [1, 12, 60])
+def test_slicer_matches_token_parser(seed, short_row_share, rows_per_section):
+    sections = _get_sections(rows_per_section=rows_per_section, short_row_share=short_row_share, seed=seed)
+    n_sliced = 0
+    for data_set, lines in sections.items():
+        df = _slice_fixed_width([line for line in map(str.rstrip, lines) if line])
+        if df is None: continue # no layout to infer (e.g. one short row); the token parser is used.
+        n_sliced += 1
+        pd.testing.assert_frame_equal(df, _get_token_df(data_set, lines))
+    if rows_per_section > 1: assert n_sliced == len(sections)
+
+def test_slicer_types_columns():
+    data_set, lines = next(iter(_get_sections(rows_per_section=24, seed=1).items()))
+    df = _section_lines_to_df(data_set, lines)
+    assert df["MTH_STRIKE"].map(type).eq(str).all()
+    for col in COLUMNS[1:]:
+        assert str(df[col].dtype) == ("Int64" if col in COUNT_COLUMNS else "float64"), col
+
+def test_slicer_strips_flags_and_reads_blanks():
+    lines = [_format_row(["JAN25", "71.20A", "71.50", "70.90", "71.10B", "71.23", "+.05", "1234", "71.18", "1500", "20000"]),
+             _format_row(["FEB25", "71.00", "71.40", "70.80", "71.00", ".9812", "UNCH", "", "71.00", "", "19000"])]
+    df = _slice_fixed_width(lines)
+    assert df["DAILY_OPEN"].tolist() == [71.20, 71.00]
+    assert df["DAILY_LAST"].tolist() == [71.10, 71.00]
+    assert df["SETT"].tolist() == [71.23, 0.9812]
+    assert df["PNT_CHGE"].tolist() == [0.05, 0.0]
+    assert df["ACT_EST_VOL"].tolist() == [1234, pd.NA]
+    assert df["PREV_DAY_VOL"].isna().tolist() == [False, True]
+    assert np.isnan(_section_lines_to_df("x", ["MAR25"])["SETT"].iloc[0])
+
+def _assert_records_match_df(data_set, lines):
+    rows, df = _section_lines_to_rows(data_set, lines), _section_lines_to_df(data_set, lines)
+    assert [row[0] or None for row in rows] == df["MTH_STRIKE"].tolist()
+    for col in ("SETT", "DAILY_LAST"):
+        k = COLUMNS.index(col)
+        assert [_to_float(row[k]) if k < len(row) else None for row in rows] == [None if np.isnan(v) else v for v in df[col]], col
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("short_row_share", [0.0, 0.3, 1.0])
+def test_splitter_matches_slicer(seed, short_row_share):
+    for data_set, lines in _get_sections(rows_per_section=12, short_row_share=short_row_share, seed=seed).items():
+        stripped = [line for line in map(str.rstrip, lines) if line]
+        assert (_split_fixed_width(stripped) is None) == (_slice_fixed_width(stripped) is None)
+        _assert_records_match_df(data_set, lines)
+
+def test_records_keep_signs():
+    lines = [_format_row(["MAY20", "-36.10", "-35.00", "-40.32", "-37.63A", "-37.63", "-.05", "1234", "18.27", "1500", "20000"]),
+             _format_row(["JUN20", "10.01", "10.50", "9.80", "-.5", "10.03", "+.00005", "", "10.00", "", "19000"])]
+    _assert_records_match_df("x", lines)
+    assert [_to_float(v) for v in ("-37.63A", "-.5", "+.00005", "71.20B", "UNCH", "")] == [-37.63, -0.5, 0.00005, 71.2, None, None]
+
+def test_splitter_rejects_token_on_boundary():
+    line = _format_row(["JAN25", "71.20", "71.50", "70.90", "71.10", "71.23", "+.05", "1234", "71.18", "1500", "20000"])
+    spans = [m.span() for m in re.finditer(r"\S+", line)]
+    (last_start, last_end), (sett_start, sett_end) = spans[4], spans[5]
+    # DAILY_LAST blank, SETT moved left to start on DAILY_LAST's right edge.
+    shifted = line[:last_start].ljust(last_end) + line[sett_start:sett_end] + " " * (sett_start - last_end) + line[sett_end:]
+    assert _slice_fixed_width([line, line, shifted]) is None
+    assert _split_fixed_width([line, line, shifted]) is None
+
+@pytest.mark.parametrize("short_row_share", [0.0, 0.3, 1.0])
+def test_front_month_rows(short_row_share):
+    for data_set, lines in _get_sections(rows_per_section=12, short_row_share=short_row_share, seed=3).items():
+        assert _section_lines_to_rows(data_set, lines, front_month=True) == _section_lines_to_rows(data_set, lines)[:1]
@@ -0,0 +1,37 @@
+####################################
+# Notes: The atomic JSON state writer and its
+# missing/corrupt fallback.
+#
+#   python -m pytest tests
+####################################
+
+import json
+import pytest
+
+from common.src.json_state import load_json, save_json
+
+
+def test_round_trip_with_dump_options(tmp_path):
+    path = tmp_path / "state.json"
+    save_json(str(path), {"b":1, "a":[2]}, indent=1, sort_keys=True)
+    assert path.read_text() == json.dumps({"a":[2], "b":1}, indent=1, sort_keys=True)
+    assert load_json(str(path), {}) == {"a":[2], "b":1}
+
+def test_missing_or_corrupt_is_the_default(tmp_path):
+    path = tmp_path / "state.json"
+    assert load_json(str(path), {"x":0}) == {"x":0}
+    path.write_text('{"a": ')
+    assert load_json(str(path), {}) == {}
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / "state.json"
+    save_json(str(path), {"a":1})
+    with pytest.raises(TypeError):
+        save_json(str(path), {"a":object()})
+    assert load_json(str(path), {}) == {"a":1}
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
+
+def test_relative_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_json("state.json", [1])
+    assert load_json("state.json", None) == [1]
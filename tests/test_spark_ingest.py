@@ -0,0 +1,58 @@
+####################################
+# Notes: Executor-side parsing in spark_ingest against
+# _section_lines_to_df (needs pyspark for the schema).
+#
+#   python -m pytest tests
+####################################
+
+import datetime
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyspark")
+
+from benchmarks.synthetic_reports import generate_report, _format_row
+from cme.src import products
+from cme.src.pull_cme_data import COLUMNS, _scan_report_lines, _section_lines_to_df
+from cme.src.spark_ingest import SCHEMA, _parse_partition
+
+FID = "STLBASIC_TEST"
+
+
+def _expected_rows(text, data_sets):
+    section_lines = _scan_report_lines(text.splitlines(keepends=True), data_sets)
+    rows = []
+    for data_set in data_sets:
+        for row in _section_lines_to_df(data_set, section_lines[data_set]).itertuples(index=False, name=None):
+            rows.append((data_set,) + tuple(None if pd.isna(v) else v for v in row))
+    return rows
+
+def _parsed_rows(text, data_sets):
+    files = [(f"reports/{FID}_20240503.txt", text.encode())]
+    return list(_parse_partition(files, {FID:data_sets}))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_rows_match_section_df(seed):
+    data_sets = list(products.PRODUCTS)
+    text = generate_report(rows_per_section=12, seed=seed)
+    rows = _parsed_rows(text, data_sets)
+    assert len(rows[0]) == len(SCHEMA.fields)
+    assert {row[:2] for row in rows} == {(datetime.date(2024, 5, 3), FID)}
+    assert [row[2:] for row in rows] == _expected_rows(text, data_sets)
+
+def test_signs_and_small_values_survive():
+    data_set = "NG Henry Hub Natural Gas Futures"
+    text = "\n".join([data_set,
+                      _format_row(["MAY20", "-36.10", "-35.00", "-40.32", "-37.63", "-37.63", "+.00005", "1234", "-37.60", "1500", "20000"]),
+                      _format_row(["JUN20", "10.01", "10.50", "9.80", "10.02", "10.03", "-.00005", "", "10.00", "", "19000"]),
+                      "TOTAL", ""])
+    rows = _parsed_rows(text, [data_set])
+    values = [dict(zip(COLUMNS, row[3:])) for row in rows]
+    assert [v["SETT"] for v in values] == [-37.63, 10.03]
+    assert [v["DAILY_LAST"] for v in values] == [-37.63, 10.02]
+    assert [v["PNT_CHGE"] for v in values] == [0.00005, -0.00005]
+    assert [v["ACT_EST_VOL"] for v in values] == [1234, None]
+    assert type(values[0]["PREV_DAY_INT"]) is int
+    assert rows == [(datetime.date(2024, 5, 3), FID) + row for row in _expected_rows(text, [data_set])]
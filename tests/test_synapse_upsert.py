@@ -0,0 +1,31 @@
+####################################
+# Notes: The SQL built for the staged MERGE upsert.
+#
+#   python -m pytest tests
+####################################
+
+from common.src.synapse_upsert import build_create_target_sql, build_merge_sql
+
+
+def test_merge_quotes_dotted_columns():
+    sql = build_merge_sql("dbo.eia", "dbo.eia_stage", ["Date"], ["U.S.", "PADD3"])
+    assert sql.splitlines() == [
+        "MERGE INTO [dbo].[eia] AS t",
+        "USING [dbo].[eia_stage] AS s",
+        "ON t.[Date] = s.[Date]",
+        "WHEN MATCHED THEN UPDATE SET t.[U.S.] = s.[U.S.], t.[PADD3] = s.[PADD3]",
+        "WHEN NOT MATCHED BY TARGET THEN INSERT ([Date], [U.S.], [PADD3]) VALUES (s.[Date], s.[U.S.], s.[PADD3]);"]
+
+def test_merge_without_value_columns_only_inserts():
+    sql = build_merge_sql("[dbo].[prices]", "dbo.prices_stage", ["date", "product"], [])
+    assert "WHEN MATCHED" not in sql
+    assert sql.splitlines()[:3] == ["MERGE INTO [dbo].[prices] AS t", "USING [dbo].[prices_stage] AS s",
+                                    "ON t.[date] = s.[date] AND t.[product] = s.[product]"]
+    assert sql.endswith("INSERT ([date], [product]) VALUES (s.[date], s.[product]);")
+
+def test_create_target_copies_stage_schema_once():
+    sql = build_create_target_sql("dbo.eia", "dbo.eia_stage")
+    assert sql.splitlines() == [
+        "IF OBJECT_ID(N'dbo.eia') IS NULL",
+        "    CREATE TABLE [dbo].[eia] WITH (DISTRIBUTION = ROUND_ROBIN)",
+        "    AS SELECT * FROM [dbo].[eia_stage] WHERE 1 = 0;"]
@@ -0,0 +1,77 @@
+####################################
+# Notes: TaskGraph scheduling: dependency results,
+# retries, timeouts and skipped dependents.
+#
+#   python -m pytest tests
+####################################
+
+import time
+import threading
+
+import pytest
+
+from common.src.task_graph import TaskGraph, MemorySink, SUCCEEDED, FAILED, SKIPPED
+
+
+@pytest.fixture
+def release():
+    ''' Set at teardown so abandoned attempts finish. '''
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_dependency_results_and_sink():
+    sink = MemorySink()
+    graph = TaskGraph(max_workers=2, sink=sink)
+    graph.add_task("a", lambda: 2)
+    graph.add_task("b", lambda: 3)
+    graph.add_task("c", lambda a, b: a*b, deps=["a", "b"], sink=True)
+    results = graph.run()
+    assert list(results) == ["a", "b", "c"]
+    assert all(r.status == SUCCEEDED for r in results.values())
+    assert sink.results == {"c":6}
+
+def test_retry_after_error():
+    calls = []
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1: raise RuntimeError("first attempt")
+        return "ok"
+    results = TaskGraph().add_task("flaky", flaky, retries=1, retry_delay=0.0).run()
+    assert (results["flaky"].status, results["flaky"].result, results["flaky"].attempts) == (SUCCEEDED, "ok", 2)
+
+def test_failure_skips_dependents_only():
+    def fail(): raise RuntimeError("down")
+    graph = TaskGraph()
+    graph.add_task("fetch", fail, retries=2, retry_delay=0.0)
+    graph.add_task("transform", lambda fetch: fetch, deps=["fetch"])
+    graph.add_task("load", lambda transform: transform, deps=["transform"])
+    graph.add_task("other", lambda: 1)
+    results = graph.run()
+    assert results["fetch"].status == FAILED and results["fetch"].attempts == 3
+    assert isinstance(results["fetch"].error, RuntimeError)
+    assert [results[n].status for n in ("transform", "load", "other")] == [SKIPPED, SKIPPED, SUCCEEDED]
+
+def test_timeout_fails_and_releases_dependents(release):
+    graph = TaskGraph()
+    graph.add_task("slow", release.wait, timeout=0.1)
+    graph.add_task("after", lambda slow: slow, deps=["slow"])
+    t0 = time.monotonic()
+    results = graph.run()
+    assert time.monotonic() - t0 < 2.0
+    assert results["slow"].status == FAILED and isinstance(results["slow"].error, TimeoutError)
+    assert results["after"].status == SKIPPED
+
+def test_timed_out_attempt_is_retried(release):
+    attempts = []
+    def hangs_once():
+        attempts.append(1)
+        if len(attempts) == 1: release.wait()
+        return len(attempts)
+    results = TaskGraph().add_task("fetch", hangs_once, timeout=0.1, retries=1, retry_delay=0.0).run()
+    assert (results["fetch"].status, results["fetch"].result, results["fetch"].attempts) == (SUCCEEDED, 2, 2)
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError):
+        TaskGraph().add_task("b", lambda a: a, deps=["a"])
@@ -0,0 +1,73 @@
+####################################
+# Notes: Deduplicated writes and the delta/publish
+# round trip of the SQLite history store.
+#
+#   python -m pytest tests
+####################################
+
+import pandas as pd
+import pytest
+
+from common.src.timeseries_store import TimeSeriesStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TimeSeriesStore(str(tmp_path / "history.sqlite"))
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=["Date", "U.S.", "PADD3"])
+
+
+def test_unchanged_values_do_not_bump_seq(store):
+    df = _frame([["2024-01-05", 100.0, 40.0], ["2024-01-12", 101.0, 41.0]])
+    assert store.write("eia", df) == 4
+    _, seq = store.get_delta("eia")
+    assert seq == 1
+
+    assert store.write("eia", df) == 0
+    history = store.get_history("eia", wide=False)
+    assert set(history["seq"]) == {1}
+    assert store.get_delta("eia")[1] == 1
+
+def test_changed_value_only_touches_its_row(store):
+    store.write("eia", _frame([["2024-01-05", 100.0, 40.0], ["2024-01-12", 101.0, 41.0]]))
+    assert store.write("eia", _frame([["2024-01-05", 100.0, 40.0], ["2024-01-12", 101.5, 41.0]])) == 1
+    history = store.get_history("eia", wide=False).set_index(["trade_date", "series"])
+    assert history.loc[("2024-01-12", "U.S."), "seq"] == 2
+    assert history.loc[("2024-01-12", "U.S."), "value"] == 101.5
+    assert history.loc[("2024-01-12", "PADD3"), "seq"] == 1
+
+def test_nan_is_skipped(store):
+    assert store.write("eia", _frame([["2024-01-05", 100.0, float("nan")]])) == 1
+    assert list(store.get_history("eia", wide=False)["series"]) == ["U.S."]
+
+def test_delta_and_mark_published_round_trip(store):
+    store.write("eia", _frame([["2024-01-05", 100.0, 40.0]]))
+    delta, seq = store.get_delta("eia")
+    assert list(delta["Date"]) == ["2024-01-05"] and seq == 1
+    store.mark_published("eia", seq)
+    assert store.get_published_seq("eia") == 1
+
+    delta, seq = store.get_delta("eia")
+    assert delta.empty and seq == 1
+
+    store.write("eia", _frame([["2024-01-05", 100.0, 42.0], ["2024-01-12", 101.0, 41.0]]))
+    delta, seq = store.get_delta("eia")
+    assert seq == 2
+    assert list(delta["Date"]) == ["2024-01-12", "2024-01-05"]
+    assert delta.loc[delta["Date"] == "2024-01-05", "PADD3"].item() == 42.0
+    assert pd.isna(delta.loc[delta["Date"] == "2024-01-05", "U.S."].item())
+
+    # Another consumer has published nothing yet.
+    assert len(store.get_delta("eia", consumer="parquet")[0]) == 2
+    store.mark_published("eia", seq)
+    assert store.get_delta("eia")[0].empty
+
+def test_datasets_are_independent(store):
+    store.write("eia", _frame([["2024-01-05", 100.0, 40.0]]))
+    store.write("eia", _frame([["2024-01-05", 100.5, 40.0]]))
+    store.write_long("cme_curve", pd.DataFrame({"Date":["2024-01-05"], "series":["CL 2024-03"], "value":[72.5]}))
+    assert store.get_delta("cme_curve")[1] == 1
+    assert store.get_latest_date("cme_curve") == "2024-01-05"
+    assert store.get_latest_date("cme") is None
@@ -0,0 +1,69 @@
+####################################
+# Notes: Exchange holidays, trading-day lookups and
+# the publish-hour cut-over of TradingCalendar.
+#
+#   python -m pytest tests
+####################################
+
+import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from cme.src.trading_calendar import TradingCalendar, get_exchange_holidays
+
+D = datetime.date
+CHICAGO = ZoneInfo("America/Chicago")
+
+
+@pytest.fixture(scope="module")
+def calendar():
+    return TradingCalendar(start_year=2020, end_year=2027)
+
+
+def test_saturday_new_year_is_not_observed(calendar):
+    assert D(2021, 12, 31) not in get_exchange_holidays(2022)
+    assert calendar.is_trading_day(D(2021, 12, 31))
+    assert not calendar.is_trading_day(D(2023, 1, 2)) # Sunday New Year's moves to Monday.
+
+@pytest.mark.parametrize("holiday", [D(2026, 7, 3),    # Independence Day on a Saturday
+                                     D(2024, 3, 29),   # Good Friday
+                                     D(2025, 4, 18),   # Good Friday
+                                     D(2022, 6, 20),   # Juneteenth on a Sunday
+                                     D(2024, 11, 28),  # Thanksgiving
+                                     D(2022, 12, 26)]) # Christmas on a Sunday
+def test_holidays_are_not_trading_days(calendar, holiday):
+    assert not calendar.is_trading_day(holiday)
+
+def test_juneteenth_only_from_2022(calendar):
+    assert calendar.is_trading_day(D(2021, 6, 18))
+
+def test_last_trading_day_skips_weekends_and_holidays(calendar):
+    assert calendar.last_trading_day(D(2024, 4, 1)) == D(2024, 4, 1)
+    assert calendar.last_trading_day(D(2024, 3, 31)) == D(2024, 3, 28) # Easter weekend after Good Friday
+    assert calendar.last_trading_day(D(2026, 7, 5)) == D(2026, 7, 2)
+
+def test_previous_trading_days_across_year_boundary(calendar):
+    assert calendar.previous_trading_days(D(2024, 1, 2), 4) == [D(2024, 1, 2), D(2023, 12, 29), D(2023, 12, 28), D(2023, 12, 27)]
+    assert calendar.previous_trading_days(D(2022, 1, 1), 2) == [D(2021, 12, 31), D(2021, 12, 30)]
+
+def test_trading_days_between(calendar):
+    assert calendar.trading_days_between(D(2023, 12, 29), D(2024, 1, 3)) == [D(2023, 12, 29), D(2024, 1, 2), D(2024, 1, 3)]
+
+@pytest.mark.parametrize("as_of, expected", [
+    (datetime.datetime(2024, 5, 3, 10, tzinfo=CHICAGO), D(2024, 5, 2)),   # before the files are up
+    (datetime.datetime(2024, 5, 3, 19, tzinfo=CHICAGO), D(2024, 5, 3)),
+    (datetime.datetime(2024, 4, 1, 9, tzinfo=CHICAGO), D(2024, 3, 28)),   # Monday morning after Good Friday
+    (datetime.datetime(2024, 5, 3, 20, tzinfo=datetime.timezone.utc), D(2024, 5, 2)),  # 15:00 in Chicago
+    (datetime.datetime(2024, 5, 4, 1, tzinfo=datetime.timezone.utc), D(2024, 5, 3)),   # Friday 20:00 in Chicago
+])
+def test_last_settlement_date_uses_exchange_time(calendar, as_of, expected):
+    assert calendar.last_settlement_date(as_of=as_of, publish_hour=18) == expected
+
+def test_last_settlement_date_without_publish_hour(calendar):
+    assert calendar.last_settlement_date(as_of=datetime.datetime(2024, 5, 3, 1), publish_hour=None) == D(2024, 5, 3)
+    assert calendar.last_settlement_date(as_of=D(2024, 5, 4), publish_hour=18) == D(2024, 5, 3)
+
+def test_window_grows_for_old_dates():
+    calendar = TradingCalendar(start_year=2024, end_year=2024)
+    assert calendar.last_trading_day(D(2019, 12, 28)) == D(2019, 12, 27)
@@ -0,0 +1,60 @@
+####################################
+# Notes: Watch mode's pipeline hand-off: failed or
+# exiting runs keep the watch polling, and the
+# watcher's --publish-hour reaches run_pipelines.
+#
+#   python -m pytest tests
+####################################
+
+import datetime
+from zoneinfo import ZoneInfo
+
+from cme.src.trading_calendar import EXCHANGE_TZ, TradingCalendar
+from common.src import watch
+from common.src.watch import NEW, PENDING, PublicationWatcher, run_pipeline
+
+
+AFTER_CLOSE = datetime.datetime(2024, 5, 3, 20, tzinfo=ZoneInfo(EXCHANGE_TZ))
+
+
+class FakeCME:
+    def __init__(self, published):
+        self.calendar = TradingCalendar()
+        self.publish_hour = 18
+        self.published = published
+
+    def is_published(self, fid, trade_date):
+        return self.published
+
+
+def test_run_pipeline_survives_bad_arguments():
+    from common.src import run_pipelines
+    assert run_pipeline(run_pipelines.main, ["--no-such-flag"]) is False
+
+def test_run_pipeline_failures_return_false():
+    assert run_pipeline(lambda argv: 1, []) is False
+    assert run_pipeline(lambda argv: 1/0, []) is False
+    assert run_pipeline(lambda argv: 0, []) is True
+
+def test_failed_run_is_not_recorded(tmp_path):
+    state_path = tmp_path / "watch_state.json"
+    runs = []
+    watcher = PublicationWatcher(lambda source, period: runs.append(period) or False, cme=FakeCME(True),
+                                 fid_dict={"F1":"x"}, state_path=str(state_path))
+    now = AFTER_CLOSE
+    assert watcher.poll("cme", now) == PENDING
+    assert runs == ["2024-05-03"] and not state_path.exists()
+
+    watcher.on_new = lambda source, period: True
+    assert watcher.poll("cme", now) == NEW
+    assert PublicationWatcher(None, cme=FakeCME(True), state_path=str(state_path)).state == {"cme":"2024-05-03"}
+
+def test_publish_hour_is_passed_to_the_pipeline(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr("cme.src.pull_cme_data.CMEDatamineAPI", lambda **kwargs: FakeCME(True))
+    monkeypatch.setattr("common.src.run_pipelines.main", lambda argv: calls.append(argv) or 0)
+    def run(self, max_polls=None):
+        self.poll("cme", AFTER_CLOSE)
+    monkeypatch.setattr(PublicationWatcher, "run", run)
+    watch.main(["--only", "cme", "--state", str(tmp_path / "s.json"), "--publish-hour", "17", "--store", "h.db"])
+    assert calls == [["--store", "h.db", "--publish-hour", "17", "--only", "cme"]]